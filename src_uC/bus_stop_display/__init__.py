@@ -14,8 +14,11 @@ from .display import *
 from .telemetry import record_telemetry
 from .stop_times import BusStopContainer
 from .time_tools import update_time, now_epoch
+from .time_tools import ms_until_next_second, ms_until_next_minute
+from .scheduler import Scheduler
+from .button import Button
 from .wifi import WifiController
-from .mqtt import MQTTController, MQTTException
+from .mqtt import MQTTController, MQTTException, ScreenMirror
 from .controller import Controller
 
 # this import will start the main run loop
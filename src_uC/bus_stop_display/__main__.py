@@ -10,10 +10,7 @@ controller = Controller()
 controller.init()
 controller.start_networking()
 controller.import_other_configs()
+controller.init_pages()
 
-
-while True:
-    controller.update_arrival_time_cache()
-    controller.draw_arrivals_board(0)
-    time.sleep(5)
+controller.run()
 
@@ -0,0 +1,102 @@
+"""
+`arrivals_fetch`
+====================================================
+
+Request the arrivals of a list of stop IDs from the backend, over
+an AsyncHTTPClient, and parse them from the response as it's
+received. Requests are conditional on the last response from the
+same url, and compressed responses are asked for if the firmware
+can decompress them.
+
+This module only imports the HTTP client and the arrivals parser,
+which don't import anything from the package either, so the
+benchmarks can use it on the MicroPython unix port.
+
+* Author: Kevin O'Connell
+
+"""
+
+from micropython import const
+
+try:
+    from .http_client import ValidatorCache, accept_encoding, body_reader
+    from .arrivals_parser import ArrivalsParser
+except ImportError:
+    # imported on its own, by the benchmarks
+    from http_client import ValidatorCache, accept_encoding, body_reader
+    from arrivals_parser import ArrivalsParser
+
+
+# responses are parsed as they're read, a chunk at a time, so only the
+# arrivals kept need memory, whatever the size of the response.
+_CHUNK_BYTES = const(512)
+
+_REQUEST_HEADERS = accept_encoding({'Accept': 'application/json'})
+
+# requests are conditional on the last response to the same url, and
+# a 304 says the arrivals of its stops haven't changed since
+_VALIDATORS = ValidatorCache()
+NOT_MODIFIED = object()
+
+
+def batch_url(url, stop_ids):
+    """Return the url that asks for all of the stop IDs at once, by
+    repeating the query parameter the stop ID is given in, as in
+    `arrivals?stop=1&stop=2`. Returns None if the stop ID isn't the
+    value of a query parameter in the url, so can't be batched."""
+
+    index = url.find('{}')
+    start = max(url.rfind('?', 0, index), url.rfind('&', 0, index))
+    if index < 0 or start < 0:
+        return None
+
+    param = url[start + 1:index]
+    if not param.endswith('=') or param.count('=') != 1:
+        return None
+
+    return url.format(stop_ids[0]) + ''.join([f'&{param}{stop_id}' for stop_id in stop_ids[1:]])
+
+
+def _not_modified(stop_ids):
+    times = {}
+    for stop_id in stop_ids:
+        times[stop_id] = (None, NOT_MODIFIED)
+    return times
+
+
+async def read_stops_times(client, url, stop_ids):
+    """Request the url with the given AsyncHTTPClient, parsing the
+    arrivals of the stop IDs from the response as it's received. Returns
+    a dict of stop_id -> (stop_name, arrivals) for each of the stops in
+    the response, with arrivals of NOT_MODIFIED for all of them if they
+    haven't changed. Each concurrent request has its own chunk buffer."""
+
+    response = await client.get(url, headers=_VALIDATORS.headers(url, _REQUEST_HEADERS))
+    if response.status == 304:
+        return _not_modified(stop_ids)
+
+    chunk_buffer = bytearray(_CHUNK_BYTES)
+    chunk = memoryview(chunk_buffer)
+
+    parser = ArrivalsParser(stop_ids)
+    try:
+        reader = body_reader(response)
+        while True:
+            count = await reader.readinto(chunk_buffer)
+            if not count:
+                break
+            parser.feed(chunk[:count])
+        times = parser.result()
+    except ValueError:
+        _VALIDATORS.forget(url)
+        raise
+    finally:
+        await response.close()
+
+    # a 304 stands in for the whole response, so the validators are only
+    # kept if every stop was in it, otherwise the next request gets them all
+    if len(times) == len(stop_ids):
+        _VALIDATORS.store(url, response)
+    else:
+        _VALIDATORS.forget(url)
+    return times
@@ -0,0 +1,296 @@
+"""
+`arrivals_parser`
+====================================================
+
+An incremental parser for the arrivals JSON returned by the
+backend, fed the response a chunk at a time as it's read from
+the socket. Only the four fields used from each arrival, of the
+requested stops, are kept, and only the soonest few of those, so
+the memory used doesn't depend on the size of the response.
+
+The response looks like:
+
+    {"<stop id>": {"stop_name": "...",
+                   "arrivals": [{"route": "...", "headsign": "...",
+                                 "real_time_arrival": "...",
+                                 "scheduled_arrival": "...", ...}, ...]},
+     ...}
+
+This module doesn't import anything from the package, so the
+benchmarks can use it on the MicroPython unix port.
+
+* Author: Kevin O'Connell
+
+"""
+
+import micropython
+from micropython import const
+
+
+# the fields kept from each arrival, any others are skipped
+ARRIVAL_FIELDS = ('route', 'headsign', 'real_time_arrival', 'scheduled_arrival')
+
+# the number of arrivals kept for each stop, the soonest ones
+ARRIVALS_PER_STOP = const(8)
+
+# strings longer than this are truncated, which only matters for headsigns
+_MAX_STRING_BYTES = const(64)
+_MAX_DEPTH = const(16)
+
+# the depth of the keys/values of interest, i.e. the number of
+# containers they're inside
+_STOP_DEPTH = const(1)
+_STOP_FIELD_DEPTH = const(2)
+_ARRIVALS_DEPTH = const(3)
+_ARRIVAL_FIELD_DEPTH = const(4)
+
+# tokenizer states
+_BETWEEN = const(0)
+_STRING = const(1)
+_ESCAPE = const(2)
+_UNICODE = const(3)
+_SCALAR = const(4)
+
+_OBJECT = const(0x7B)           # {
+_OBJECT_END = const(0x7D)       # }
+_ARRAY = const(0x5B)            # [
+_ARRAY_END = const(0x5D)        # ]
+_QUOTE = const(0x22)            # "
+_BACKSLASH = const(0x5C)        # \
+_COLON = const(0x3A)            # :
+_COMMA = const(0x2C)            # ,
+
+_ESCAPES = {0x62: 0x08, 0x66: 0x0C, 0x6E: 0x0A, 0x72: 0x0D, 0x74: 0x09}
+
+
+def _utf8_boundary(string, length: int) -> int:
+    """Return the length of the string, less any multi-byte UTF-8
+    character cut short at the end of it by truncation."""
+
+    # step back over the continuation bytes, 0b10xxxxxx, to the lead byte
+    start = length
+    while start > 0 and (string[start - 1] & 0xC0) == 0x80:
+        start -= 1
+    if start == 0 or string[start - 1] < 0xC0:
+        return length
+
+    # the lead byte's high bits give the length of its character
+    lead = start - 1
+    lead_byte = string[lead]
+    size = 2 if lead_byte < 0xE0 else (3 if lead_byte < 0xF0 else 4)
+    return length if length - lead >= size else lead
+
+
+class ArrivalsParser:
+    """Parse the arrivals of the given stop IDs from the response, fed
+    in chunks with `feed()`, keeping at most `max_arrivals` per stop."""
+
+    def __init__(self, stop_ids, max_arrivals: int = ARRIVALS_PER_STOP):
+        self.max_arrivals = max_arrivals
+
+        self._wanted = {}
+        for stop_id in stop_ids:
+            self._wanted[str(stop_id)] = stop_id
+        self._names = {}
+        self._arrivals = {}
+        self._complete = []
+
+        self._stack = bytearray(_MAX_DEPTH)
+        self._depth = 0
+        self._keys = [None] * _MAX_DEPTH
+        self._expect_key = False
+        self._started = False
+
+        self._state = _BETWEEN
+        self._is_key = False
+        self._capture = False
+        self._string = bytearray(_MAX_STRING_BYTES)
+        self._length = 0
+        self._unicode = 0
+        self._unicode_digits = 0
+
+        self._stop = None
+        self._record = None
+
+    def result(self) -> dict:
+        """Return a dict of stop_id -> (stop_name, arrivals) for each of the
+        stops in the response, each arrival a dict of the ARRIVAL_FIELDS."""
+
+        if not self._started or self._depth != 0 or self._state != _BETWEEN:
+            raise ValueError('incomplete arrivals response')
+
+        times = {}
+        for stop_id in self._complete:
+            times[stop_id] = (self._names.get(stop_id), self._arrivals.get(stop_id, []))
+        return times
+
+    def _append(self, byte: int):
+        if self._capture and self._length < _MAX_STRING_BYTES:
+            self._string[self._length] = byte
+            self._length += 1
+
+    def _append_code_point(self, code_point: int):
+        if 0xD800 <= code_point < 0xE000:
+            # surrogate pairs are beyond what the font can show anyway
+            code_point = 0x3F
+        for byte in chr(code_point).encode():
+            self._append(byte)
+
+    def _start_token(self, is_key: bool):
+        self._is_key = is_key
+        self._length = 0
+
+        depth = self._depth
+        keys = self._keys
+        if is_key:
+            self._capture = depth == _STOP_DEPTH or depth == _STOP_FIELD_DEPTH or depth == _ARRIVAL_FIELD_DEPTH
+        elif depth == _STOP_FIELD_DEPTH:
+            self._capture = self._stop is not None and keys[depth] == 'stop_name'
+        elif depth == _ARRIVAL_FIELD_DEPTH:
+            self._capture = self._record is not None and keys[depth] in self._record
+        else:
+            self._capture = False
+
+    def _end_token(self, is_string: bool):
+        self._state = _BETWEEN
+        if not self._capture:
+            return
+
+        length = self._length
+        if length == _MAX_STRING_BYTES:
+            length = _utf8_boundary(self._string, length)
+        value = bytes(self._string[:length]).decode()
+        depth = self._depth
+
+        if self._is_key:
+            self._keys[depth] = value
+        elif not is_string and value.startswith('n'):
+            value = None
+
+        if self._is_key:
+            return
+        if depth == _STOP_FIELD_DEPTH:
+            self._names[self._stop] = value
+        else:
+            self._record[self._keys[depth]] = value
+
+    def _open(self, container: int):
+        depth = self._depth
+        if depth >= _MAX_DEPTH:
+            raise ValueError('arrivals response nested too deeply')
+
+        self._stack[depth] = container
+        self._depth = depth = depth + 1
+        self._expect_key = container == _OBJECT
+        self._keys[depth] = None
+        self._started = True
+
+        if container != _OBJECT:
+            return
+
+        keys = self._keys
+        stack = self._stack
+        if depth == _STOP_FIELD_DEPTH:
+            self._stop = self._wanted.get(keys[_STOP_DEPTH])
+            if self._stop is not None:
+                self._arrivals[self._stop] = []
+        elif (depth == _ARRIVAL_FIELD_DEPTH and self._stop is not None and
+              stack[_ARRIVALS_DEPTH - 1] == _ARRAY and keys[_STOP_FIELD_DEPTH] == 'arrivals'):
+            self._record = {}
+            for field in ARRIVAL_FIELDS:
+                self._record[field] = None
+
+    def _close(self, container: int):
+        depth = self._depth
+        if depth == 0 or self._stack[depth - 1] != container - 2:
+            raise ValueError('malformed arrivals response')
+
+        if container == _OBJECT_END:
+            if depth == _ARRIVAL_FIELD_DEPTH and self._record is not None:
+                self._keep(self._record)
+                self._record = None
+            elif depth == _STOP_FIELD_DEPTH and self._stop is not None:
+                self._complete.append(self._stop)
+                self._stop = None
+
+        self._depth = depth - 1
+        self._expect_key = False
+
+    def _keep(self, record: dict):
+        """Keep the arrival, if it's valid and one of the soonest."""
+
+        arrival_time = record['real_time_arrival']
+        if not arrival_time or not record['headsign']:
+            return
+
+        arrivals = self._arrivals[self._stop]
+        if len(arrivals) < self.max_arrivals:
+            arrivals.append(record)
+            return
+
+        # the timestamps are ISO format, so sort as strings
+        latest = 0
+        for i in range(1, len(arrivals)):
+            if arrivals[i]['real_time_arrival'] > arrivals[latest]['real_time_arrival']:
+                latest = i
+        if arrival_time < arrivals[latest]['real_time_arrival']:
+            arrivals[latest] = record
+
+    @micropython.native
+    def feed(self, chunk):
+        """Parse the next chunk of the response."""
+
+        for byte in chunk:
+            state = self._state
+
+            if state == _STRING:
+                if byte == _QUOTE:
+                    self._end_token(True)
+                elif byte == _BACKSLASH:
+                    self._state = _ESCAPE
+                else:
+                    self._append(byte)
+                continue
+
+            if state == _ESCAPE:
+                if byte == 0x75:        # u
+                    self._state = _UNICODE
+                    self._unicode = 0
+                    self._unicode_digits = 0
+                else:
+                    self._append(_ESCAPES.get(byte, byte))
+                    self._state = _STRING
+                continue
+
+            if state == _UNICODE:
+                self._unicode = (self._unicode << 4) | int(chr(byte), 16)
+                self._unicode_digits += 1
+                if self._unicode_digits == 4:
+                    self._append_code_point(self._unicode)
+                    self._state = _STRING
+                continue
+
+            if state == _SCALAR:
+                if byte > 0x20 and byte != _COMMA and byte != _OBJECT_END and byte != _ARRAY_END:
+                    self._append(byte)
+                    continue
+                self._end_token(False)
+
+            # between tokens
+            if byte <= 0x20:
+                continue
+            elif byte == _QUOTE:
+                self._start_token(self._expect_key)
+                self._state = _STRING
+            elif byte == _OBJECT or byte == _ARRAY:
+                self._open(byte)
+            elif byte == _OBJECT_END or byte == _ARRAY_END:
+                self._close(byte)
+            elif byte == _COLON:
+                self._expect_key = False
+            elif byte == _COMMA:
+                self._expect_key = self._stack[self._depth - 1] == _OBJECT
+            else:
+                self._start_token(False)
+                self._state = _SCALAR
+                self._append(byte)
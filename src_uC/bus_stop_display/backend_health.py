@@ -0,0 +1,110 @@
+"""
+`backend_health`
+====================================================
+
+Track whether the data backend is answering, shared by everything
+that makes requests to it. After a failure, requests are held off
+for an exponentially growing, jittered, backoff. After repeated
+failures the circuit breaker opens, and only a single probe is let
+through every so often, until the backend answers again. Nothing
+here blocks: callers ask whether a request is allowed, and how
+long until it will be, and carry on drawing from cached data.
+
+* Author: Kevin O'Connell
+
+"""
+
+import time
+import random
+from micropython import const
+
+from . import log
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+# the backoff after the first failure, doubling with each failure after
+_BACKOFF_MIN_MS = const(2000)
+_BACKOFF_MAX_MS = const(60000)
+
+# the breaker opens after this many failures in a row, and then probes
+# the backend once per interval
+_FAILURE_THRESHOLD = const(5)
+_PROBE_INTERVAL_MS = const(60000)
+
+
+def _jitter(delay_ms: int) -> int:
+    """Return a random delay between half and all of delay_ms, so devices
+    that failed together don't all retry together."""
+    return (delay_ms * (0x8000 + random.getrandbits(15))) >> 16
+
+
+class BackendHealth:
+    """A circuit breaker with exponential backoff. Each refresh asks
+    `allow_request()` first, then reports how it went."""
+
+    def __init__(self, backoff_min_ms: int = _BACKOFF_MIN_MS, backoff_max_ms: int = _BACKOFF_MAX_MS,
+                 failure_threshold: int = _FAILURE_THRESHOLD,
+                 probe_interval_ms: int = _PROBE_INTERVAL_MS):
+        self.backoff_min_ms = backoff_min_ms
+        self.backoff_max_ms = backoff_max_ms
+        self.failure_threshold = failure_threshold
+        self.probe_interval_ms = probe_interval_ms
+
+        self.state = CLOSED
+        self.failures = 0
+        self._retry_at = None
+
+        self.total_failures = 0
+        self.trips = 0
+        self.rejected = 0
+
+    def ms_until_allowed(self) -> int:
+        """Return the ms until a request is allowed, 0 if it is now."""
+
+        if self._retry_at is None:
+            return 0
+        return max(0, time.ticks_diff(self._retry_at, time.ticks_ms()))
+
+    def allow_request(self) -> bool:
+        """Return True if a request can be made now. Once the breaker is
+        open, the first request allowed is the probe."""
+
+        if self.ms_until_allowed() > 0:
+            self.rejected += 1
+            return False
+
+        if self.state == OPEN:
+            self.state = HALF_OPEN
+            log.info('Probing the backend')
+        return True
+
+    def record_success(self):
+        if self.state != CLOSED:
+            log.info(f'Backend answered again after {self.failures} failure(s)')
+
+        self.state = CLOSED
+        self.failures = 0
+        self._retry_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        self.total_failures += 1
+
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state == CLOSED:
+                self.trips += 1
+                log.error(f'Backend failed {self.failures} times in a row, '
+                          f'probing it every {self.probe_interval_ms // 1000} s')
+            self.state = OPEN
+            delay_ms = self.probe_interval_ms
+        else:
+            delay_ms = min(self.backoff_max_ms, self.backoff_min_ms << (self.failures - 1))
+
+        self._retry_at = time.ticks_add(time.ticks_ms(), _jitter(delay_ms))
+
+
+# the one backend, shared by all stops
+BACKEND_HEALTH = BackendHealth()
@@ -0,0 +1,58 @@
+"""
+`button`
+====================================================
+
+A debounced push button, read from a pin interrupt, so
+presses are handled promptly even while the main loop is
+blocked on the network.
+
+* Author: Kevin O'Connell
+
+"""
+
+import time
+import micropython
+
+from machine import Pin
+from micropython import const
+
+
+_DEFAULT_DEBOUNCE_MS = const(50)
+
+
+class Button:
+    """A button wired between the pin and ground, using the internal
+    pull-up. Each press schedules the callback to run in the main thread,
+    any edges within the debounce time of the last press are ignored."""
+
+    def __init__(self, pin_number: int, callback, debounce_ms: int = _DEFAULT_DEBOUNCE_MS):
+        self.callback = callback
+        self.debounce_ms = debounce_ms
+
+        self._last_press_ms = time.ticks_ms()
+        self._pending = False
+
+        # bound methods are created once, since the interrupt
+        # handler isn't allowed to allocate.
+        self._run_callback_ref = self._run_callback
+
+        self.pin = Pin(pin_number, Pin.IN, Pin.PULL_UP)
+        self.pin.irq(trigger=Pin.IRQ_FALLING, handler=self._on_irq)
+
+    def _on_irq(self, pin):
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self._last_press_ms) < self.debounce_ms:
+            return
+        self._last_press_ms = now
+
+        if not self._pending:
+            self._pending = True
+            try:
+                micropython.schedule(self._run_callback_ref, None)
+            except RuntimeError:
+                # the schedule queue is full, drop the press
+                self._pending = False
+
+    def _run_callback(self, _):
+        self._pending = False
+        self.callback()
@@ -134,14 +134,14 @@ class ConfigImportMixin:
 
             self.config[name] = value
 
-    def import_optional_param(self, name, default):
+    def import_optional_param(self, name, default, ptype=None):
         """Import the optional parameter given by name, type casting to
-        be the same type as the default value."""
+        be the same type as the default value, unless ptype is given."""
 
         if name not in self._staging_config:
             self.config[name] = default
         else:
-            ptype = type(default)
+            ptype = ptype or type(default)
             try:
                 value = ptype(self._staging_config[name])
             except TypeError:
@@ -166,6 +166,10 @@ class GeneralConfig(ConfigImportMixin):
         self.import_optional_param('wifi_connect_cooldown', default=10)
 
         self.import_required_param('data_backend_url', ptype=str)
+        self.import_optional_param('fetch_connections', default=2)
+        self.import_optional_param('poll_interval_min_secs', default=5)
+        self.import_optional_param('poll_interval_max_secs', default=120)
+        self.import_optional_param('background_stale_secs', default=60)
         self.import_required_param('time_servers', ptype=str)
         self.config['time_servers'] = self.config['time_servers'].split(',')
 
@@ -177,6 +181,16 @@ class GeneralConfig(ConfigImportMixin):
             self.import_optional_param('mqtt_password', default='')
             self.import_optional_param('mqtt_auth_cert', default='')
             self.import_required_param('mqtt_root_topic')
+            self.import_optional_param('screen_stream_secs', default=0)
+
+        self.import_optional_param('display_double_buffered', default=False, ptype=boolean)
+        self.import_optional_param('marquee_headsigns', default=False, ptype=boolean)
+        self.import_optional_param('marquee_frame_rate', default=10)
+        self.import_optional_param('text_mode_minutes', default=False, ptype=boolean)
+
+        self.import_optional_param('button_pin', default=None, ptype=int)
+        self.import_optional_param('button_debounce_ms', default=50)
+        self.import_optional_param('page_rotate_secs', default=0)
 
 
 def is_integer(my_str):
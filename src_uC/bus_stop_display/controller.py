@@ -6,15 +6,20 @@ from . import log
 from . import log_traceback
 from . import WifiController
 from . import BusStopDisplay
+from . import Pages
 from . import BusStopContainer
 
 from . import now_epoch
+from . import ms_until_next_second, ms_until_next_minute
+from . import Scheduler
+from . import Button
 
 from . import GeneralConfig
 from . import import_key_value_settings
 
 from . import update_time
 from . import MQTTController
+from . import ScreenMirror
 
 
 _GENERAL_CONFIG = const('/settings/general.cfg')
@@ -24,6 +29,27 @@ _NAME_SUBS_CONFIG = const('/settings/name_subs.cfg')
 
 _SERVICE_DESIGNATION_WIDTH = const(4)
 
+# the hourglass is shown in the bottom right corner while fetching,
+# only once a fetch has taken longer than the delay, e.g. on retries.
+_FETCH_LOADING_X = const(104)
+_FETCH_LOADING_Y = const(40)
+_FETCH_LOADING_DELAY_MS = const(1000)
+
+# pages that aren't visible are only fetched if the visible page isn't
+# due to be fetched within this time, so they never hold it up.
+_BACKGROUND_IDLE_MS = const(2000)
+
+# the next page in the rotation is fetched at the same rate as the
+# visible page, for this long before it's shown.
+_PREFETCH_MS = const(10000)
+
+# how often to check for screen snapshot requests over MQTT
+_SCREEN_POLL_MS = const(1000)
+
+# redraws are scheduled just after the time changes, so the
+# second or minute has definitely ticked over.
+_REDRAW_MARGIN_MS = const(20)
+
 
 # an error decorator to display an error on the
 # LCD any time a critical error happens.
@@ -52,7 +78,24 @@ class Controller:
 
     def __init__(self):
         self._display = BusStopDisplay()
+        self._pages: Pages = None
+        self._button: Button = None
+
+        # a fingerprint of the last board drawn on each page, to skip
+        # redrawing when nothing that's shown has changed.
+        self._board_fingerprints = []
+        self.frames_rendered = 0
+        self.frames_skipped = 0
+
+        self._scheduler = Scheduler()
+        self._fetch_task = None
+        self._background_task = None
+        self._redraw_task = None
+        self._page_task = None
+        self._rotate_task = None
+        self._page_presses = 0
         self._mqtt = None
+        self._screen_mirror = None
         self._wlan = None
 
         self._general_cfg: GeneralConfig = None
@@ -67,11 +110,42 @@ class Controller:
         self._display.backlight_on()
         self.import_general_config()
 
+        if self._general_cfg['display_double_buffered']:
+            if self._display.start_background_transmitter():
+                log.info('Display frames will be transmitted in the background')
+            else:
+                log.error('Threads unavailable, display frames will be sent synchronously')
+
+        if self._general_cfg['marquee_headsigns']:
+            self._display.enable_marquee(self._general_cfg['marquee_frame_rate'])
+
+        if self._general_cfg['text_mode_minutes']:
+            self._display.enable_text_mode()
+
+    def init_pages(self):
+        """Create a page for each configured stop, starting on the default
+        stop, and the button to cycle through them."""
+
+        # the board layout depends on the display modes enabled in init()
+        stop_count = self._stops.stop_count
+        self._pages = Pages(self._display, stop_count,
+                            designation_min_char_width=_SERVICE_DESIGNATION_WIDTH,
+                            visible=self._stops.default_index)
+        self._board_fingerprints = [None] * stop_count
+
+        if self._general_cfg['button_pin'] is not None:
+            self._button = Button(self._general_cfg['button_pin'], self._on_button_press,
+                                  self._general_cfg['button_debounce_ms'])
+            log.info(f'Page button on GP{self._general_cfg["button_pin"]}')
+
     def start_networking(self):
         """Run all the networking setup commands."""
 
-        self.connect_wifi()
-        self.update_time()
+        # the display is blank until the first board is drawn, so show
+        # the hourglass in the middle of it while waiting on the network.
+        with self._display.loading():
+            self.connect_wifi()
+            self.update_time()
         self.connect_to_mqtt()
 
         if self._mqtt is not None:
@@ -90,12 +164,15 @@ class Controller:
         self._import_stops_config()
         self._import_name_subs_config()
         self._stops.set_name_substitutions(self._name_subs)
+        self._stops.set_poll_interval(self._general_cfg['poll_interval_min_secs'],
+                                      self._general_cfg['poll_interval_max_secs'])
 
     @show_error('importing: stops.cfg')
     def _import_stops_config(self):
         """Import the general config settings."""
         self._stops = BusStopContainer(_STOPS_CONFIG,
-                                       self._general_cfg['data_backend_url'])
+                                       self._general_cfg['data_backend_url'],
+                                       self._general_cfg['fetch_connections'])
         log.info(f'Imported {self._stops.stop_count} bus stop(s) from "stops.cfg"')
 
     @show_error('importing: name_subs.cfg')
@@ -130,12 +207,164 @@ class Controller:
             else:
                 self._mqtt = mqtt
                 self._mqtt.set_root_topic(self._general_cfg['mqtt_root_topic'])
+                self._screen_mirror = ScreenMirror(
+                    mqtt, self._display.display,
+                    stream_interval_ms=1000 * self._general_cfg['screen_stream_secs'])
+
+    def run(self):
+        """Run the main loop forever. Arrival times are fetched on their own
+        schedule, and the board is redrawn when new data lands, and exactly
+        when the clock or any of the countdowns next change."""
+
+        # the fetch task is added first, so it runs first when both are due
+        self._fetch_task = self._scheduler.add('fetch', self._fetch)
+        self._redraw_task = self._scheduler.add('redraw', self._redraw)
+        if len(self._pages) > 1:
+            self._background_task = self._scheduler.add('background', self._fetch_background)
+
+        # only run when a button press arrives mid-frame
+        self._page_task = self._scheduler.add('page', self._switch_pages)
+
+        if self._screen_mirror is not None:
+            self._scheduler.add('screen', self._mirror_screen)
+
+        rotate_ms = 1000 * self._general_cfg['page_rotate_secs']
+        if rotate_ms > 0 and len(self._pages) > 1:
+            self._rotate_task = self._scheduler.add('rotate', self._rotate, rotate_ms)
+
+        self._scheduler.run_forever()
+
+    def _priority_pages(self):
+        """The visible page, and the next page in the rotation if it's
+        about to be shown."""
+
+        visible = self._pages.visible
+        pages = [visible]
+        if (self._rotate_task is not None and
+                time.ticks_diff(self._rotate_task.due, time.ticks_ms()) < _PREFETCH_MS):
+            pages.append((visible + 1) % len(self._pages))
+        return pages
+
+    def _fetch(self):
+        """Fetch the arrivals of the pages on, or about to be on, the screen,
+        when they're due to be polled."""
+
+        pages = self._priority_pages()
+        with self._display.loading(_FETCH_LOADING_X, _FETCH_LOADING_Y,
+                                   _FETCH_LOADING_DELAY_MS):
+            self.update_arrival_time_cache(pages)
+        self._arrivals_updated()
+
+        # each page is polled again after an interval that depends on how
+        # soon its next departure is, and the next page in the rotation
+        # joins in once it's about to be shown.
+        delay_ms = self._stops.ms_until_poll(pages)
+        if self._rotate_task is not None and len(pages) == 1:
+            prefetch_ms = time.ticks_diff(self._rotate_task.due, time.ticks_ms()) - _PREFETCH_MS
+            delay_ms = min(delay_ms, max(0, prefetch_ms))
+        return delay_ms
+
+    def _fetch_background(self):
+        """Fetch the arrivals of the pages that aren't on the screen, once
+        they're older than the staleness budget, in the idle time between
+        fetches of the visible page."""
+
+        priority = self._priority_pages()
+        pages = [i for i in range(len(self._pages)) if i not in priority]
+        if not pages:
+            # every page is a priority while the next is about to be shown
+            return _PREFETCH_MS
+
+        budget_ms = 1000 * self._general_cfg['background_stale_secs']
+        delay_ms = self._stops.ms_until_stale(pages, budget_ms)
+        if delay_ms > 0:
+            return delay_ms
+
+        # wait until after the visible page is fetched, if it's due soon
+        fetch_due_ms = time.ticks_diff(self._fetch_task.due, time.ticks_ms())
+        if fetch_due_ms < _BACKGROUND_IDLE_MS:
+            return max(0, fetch_due_ms) + _BACKGROUND_IDLE_MS
+
+        self.update_arrival_time_cache(pages, budget_ms)
+        self._arrivals_updated()
+        return self._stops.ms_until_stale(pages, budget_ms)
+
+    def _arrivals_updated(self):
+        # render the badges for any new routes outside of the redraw
+        self._display.prerender_badges(self._stops.routes(), _SERVICE_DESIGNATION_WIDTH)
+        self._scheduler.trigger(self._redraw_task)
+
+    def _redraw(self):
+        # pages that aren't visible are rendered in the background, so
+        # they're ready to be swapped in by the button.
+        for index in range(len(self._pages)):
+            self.draw_arrivals_board(index)
+        return self._ms_until_board_changes(self._pages.visible)
+
+    def _mirror_screen(self):
+        try:
+            self._screen_mirror.poll()
+        except Exception as exc:
+            log.error('Unable to publish a screen snapshot')
+            log_traceback(exc)
+        return _SCREEN_POLL_MS
+
+    def _on_button_press(self):
+        """Called from the main thread, soon after the button is pressed,
+        which could be in the middle of a fetch or drawing a frame."""
+
+        self._page_presses += 1
+        if self._display.busy:
+            # finish drawing the frame first
+            self._scheduler.trigger(self._page_task)
+        else:
+            self._switch_pages()
+
+    def _rotate(self):
+        self._page_presses += 1
+        self._switch_pages()
+        return 1000 * self._general_cfg['page_rotate_secs']
+
+    def _switch_pages(self):
+        """Move on by one page for each press since the last switch."""
+
+        presses, self._page_presses = self._page_presses, 0
+        if not presses:
+            return None
+
+        start = time.ticks_us()
+        self._pages.show((self._pages.visible + presses) % len(self._pages))
+        log.info(f'switched to page {self._pages.visible} in '
+                 f'{(time.ticks_us() - start) / 1000:.1f} ms, '
+                 f'sent {self._display.rows_sent} rows / {self._display.bytes_sent} bytes.')
+
+        # the next redraw now depends on the new page, and a manual
+        # switch restarts the time until the next rotation.
+        self._scheduler.trigger(self._redraw_task)
+        if self._rotate_task is not None:
+            self._scheduler.schedule(self._rotate_task, 1000 * self._general_cfg['page_rotate_secs'])
+
+        # the new page is now fetched first, if it's due
+        self._scheduler.trigger(self._fetch_task)
+        return None
+
+    def _ms_until_board_changes(self, stop_index):
+        """Return the ms until the clock, or any of the countdowns on the
+        given board next change."""
+
+        delay_ms = ms_until_next_minute()
+
+        secs = self._stops[stop_index].seconds_until_countdown_change()
+        if secs is not None:
+            delay_ms = min(delay_ms, ms_until_next_second() + (1000 * secs))
+
+        return delay_ms + _REDRAW_MARGIN_MS
 
     @show_error('updating arrival times')
-    def update_arrival_time_cache(self):
-        """Update all time for all monitored bus stops"""
-        self._stops.update_times()
-        log.info('finished updating arrivals for all bus stops')
+    def update_arrival_time_cache(self, pages, stale_budget_ms=None):
+        """Update the times of the bus stops on the given pages"""
+        self._stops.update_times(pages, stale_budget_ms)
+        log.info(f'finished updating arrivals for pages {pages}')
 
     @show_error('drawing arrivals board')
     def draw_arrivals_board(self, stop_index):
@@ -145,16 +374,40 @@ class Controller:
 
         bus_stop = self._stops[stop_index]
 
-        self._display.clear_framebuffer()
-        self._display.title_text(bus_stop.name, 0, 0, color=1)
-        self._display.draw_clock(91, 1, now_epoch())
-
         arrivals_board = [(t['route'], t['headsign'], str(t['minutes']))
                                 for t in bus_stop.arrival_board()]
-
-        self._display.draw_schedule_lines(y=14, lines=arrivals_board,
-                                          designation_min_char_width=_SERVICE_DESIGNATION_WIDTH)
-
-        self._display.show()
-
-        log.info(f'display update took {(time.ticks_us() - start) / 1000:.1f} ms.')
+        epoch = now_epoch()
+
+        # if everything shown on the board is the same as the last frame,
+        # there's nothing to render or send.
+        fingerprint = (bus_stop.name, epoch // 60, tuple(arrivals_board))
+        if fingerprint == self._board_fingerprints[stop_index]:
+            self.frames_skipped += 1
+            return
+
+        # only the widgets that changed are redrawn, and only sent to the
+        # display if the page is visible. The fingerprint is only kept once
+        # the render succeeds, so a failed one is tried again next time.
+        redrawn = self._pages.render(stop_index, bus_stop.name, epoch, arrivals_board)
+        self._board_fingerprints[stop_index] = fingerprint
+        self.frames_rendered += 1
+
+        if not redrawn:
+            return
+        if stop_index != self._pages.visible:
+            return
+
+        log.info(f'display update took {(time.ticks_us() - start) / 1000:.1f} ms, '
+                 f'sent {self._display.rows_sent} rows / {self._display.bytes_sent} bytes, '
+                 f'text cache {self._display.text_strips.hits} hits / '
+                 f'{self._display.text_strips.misses} misses, '
+                 f'{self.frames_rendered} frames rendered / {self.frames_skipped} skipped.')
+
+        if self._display.text_mode:
+            log.info(f'{self._display.display.text_bytes_total} bytes sent to the text RAM in total.')
+
+        marquee = self._display.marquee
+        if marquee is not None and marquee.running:
+            log.info(f'marquee running at {marquee.frame_rate:.1f} fps, '
+                     f'{marquee.bytes_per_step:.0f} bytes per step, '
+                     f'{marquee.skipped_steps} steps skipped.')
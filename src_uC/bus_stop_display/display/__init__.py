@@ -1,2 +1,4 @@
 from . import sprites
-from .bus_stop_display import BusStopDisplay
\ No newline at end of file
+from .bus_stop_display import BusStopDisplay
+from .arrivals_board import ArrivalsBoard
+from .pages import Pages
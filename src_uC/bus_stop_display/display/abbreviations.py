@@ -0,0 +1,142 @@
+"""
+`abbreviations`
+====================================================
+
+Shorten headsigns to fit the space available on a schedule
+line, using a few rules that keep the most useful part of
+the name, before falling back to truncating it.
+
+* Author: Kevin O'Connell
+
+"""
+
+from micropython import const
+
+from .lru_cache import LRUCache
+
+
+# the number of fitted (headsign, width) pairs to remember
+ABBREVIATION_CACHE_COUNT = const(32)
+
+# common words and phrases in headsigns, and their abbreviations. They're
+# applied in this order, one at a time, until the headsign fits.
+WORD_ABBREVIATIONS = (
+    ('shopping centre', 'S.C.'),
+    ('train station', 'Stn'),
+    ('centre', 'Ctr'),
+    ('point', 'Pt.'),
+    ('station', 'Stn'),
+    ('street', 'St'),
+    ('road', 'Rd'),
+    ('avenue', 'Ave'),
+    ('terrace', 'Tce'),
+    ('park', 'Pk'),
+    ('industrial', 'Ind.'),
+    ('estate', 'Est.'),
+    ('business', 'Bus.'),
+    ('university', 'Univ.'),
+    ('hospital', 'Hosp.'),
+    ('college', 'Coll.'),
+    ('airport', 'Airpt'),
+    ('village', 'Vill.'),
+    ('north', 'N.'),
+    ('south', 'S.'),
+    ('east', 'E.'),
+    ('west', 'W.'),
+    ('upper', 'Up.'),
+    ('lower', 'Lr.'),
+    ('saint', 'St.'),
+    ('train', ''),
+)
+
+
+def _drop_brackets(text: str) -> str:
+    """Remove any part of the text in brackets."""
+
+    start = text.find('(')
+    while start >= 0:
+        end = text.find(')', start)
+        if end < 0:
+            break
+        text = text[:start].rstrip() + text[end + 1:]
+        start = text.find('(')
+    return text.strip()
+
+
+def _drop_via(text: str) -> str:
+    """Remove everything from the word "via" onwards."""
+
+    index = text.lower().find(' via ')
+    return text[:index].rstrip() if index > 0 else text
+
+
+def _abbreviate_word(text: str, phrase: str, abbreviation: str) -> str:
+    """Replace every occurrence of the whole word, or words, in any case."""
+
+    phrase = phrase.split(' ')
+    count = len(phrase)
+
+    words = text.split(' ')
+    changed = False
+    i = 0
+    while i <= len(words) - count:
+        if [w.lower() for w in words[i:i + count]] == phrase:
+            words[i:i + count] = [abbreviation]
+            changed = True
+        i += 1
+
+    if not changed:
+        return text
+
+    # abbreviating to nothing leaves empty words behind
+    return ' '.join([w for w in words if w])
+
+
+class Abbreviator:
+    """Fit headsigns to a number of characters, remembering the result
+    for each (headsign, width), so each one is only worked out once.
+
+    Name substitutions are applied before the headsign gets here, so any
+    name given in name_subs.cfg that fits is always shown as it is."""
+
+    def __init__(self, cache_count: int = ABBREVIATION_CACHE_COUNT):
+        self._fitted = LRUCache(cache_count)
+
+    @property
+    def hits(self) -> int:
+        return self._fitted.hits
+
+    @property
+    def misses(self) -> int:
+        return self._fitted.misses
+
+    def fit(self, headsign: str, max_chars: int):
+        """Return (text, truncated), the headsign shortened to at most
+        max_chars, and whether it had to be truncated to get there."""
+
+        key = (headsign, max_chars)
+        fitted = self._fitted.get(key)
+        if fitted is None:
+            fitted = self._fitted.put(key, self._fit(headsign, max_chars))
+        return fitted
+
+    @staticmethod
+    def _fit(headsign: str, max_chars: int):
+        text = headsign
+        if len(text) <= max_chars:
+            return text, False
+
+        text = _drop_brackets(text)
+        if len(text) <= max_chars:
+            return text, False
+
+        for word, abbreviation in WORD_ABBREVIATIONS:
+            text = _abbreviate_word(text, word, abbreviation)
+            if len(text) <= max_chars:
+                return text, False
+
+        text = _drop_via(text)
+        if len(text) <= max_chars:
+            return text, False
+
+        return text[:max_chars], True
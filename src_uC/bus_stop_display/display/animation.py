@@ -0,0 +1,116 @@
+"""
+`animation`
+====================================================
+
+A base class for animations driven by a soft timer, so the
+display keeps moving while the main loop is blocked, e.g.
+waiting on the network.
+
+* Author: Kevin O'Connell
+
+"""
+
+import time
+import micropython
+
+from machine import Timer
+
+
+class TimerAnimation:
+    """Run `step()` at a steady rate from a timer. The timer callback only
+    schedules the step, so it runs in the main thread between bytecodes,
+    including while it's blocked in a network call. If the main thread is
+    in the middle of drawing, i.e. the display is busy, the step is skipped
+    rather than drawing into a half finished frame."""
+
+    def __init__(self, display, period_ms: int):
+        self.display = display
+        self.period_ms = period_ms
+        self.running = False
+
+        self._timer = None
+        self._step_pending = False
+
+        # the bound method is created once, since the timer callback
+        # may run in an interrupt where allocation isn't allowed.
+        self._run_step_ref = self._run_step
+
+        # statistics, to measure the achieved frame rate and SPI cost
+        self.steps = 0
+        self.skipped_steps = 0
+        self.bytes_sent = 0
+        self._started_ms = 0
+        # the time run before the last start, so stopping and starting
+        # again doesn't throw off the frame rate
+        self._run_ms = 0
+
+    def start(self):
+        """Start the timer, the first step is after one period."""
+
+        if self.running:
+            return
+
+        self.running = True
+        self._started_ms = time.ticks_ms()
+        self._timer = Timer(-1)
+        self._timer.init(mode=Timer.PERIODIC, period=self.period_ms,
+                         callback=self._on_timer)
+
+    def stop(self):
+        """Stop the timer, any step already scheduled won't run."""
+
+        if self.running:
+            self._run_ms += time.ticks_diff(time.ticks_ms(), self._started_ms)
+
+        self.running = False
+        if self._timer is not None:
+            self._timer.deinit()
+            self._timer = None
+
+    def _on_timer(self, timer):
+        if not self._step_pending:
+            self._step_pending = True
+            try:
+                micropython.schedule(self._run_step_ref, None)
+            except RuntimeError:
+                # the schedule queue is full, try again next tick
+                self._step_pending = False
+
+    def _run_step(self, _):
+        self._step_pending = False
+        if not self.running:
+            return
+
+        if self.display.busy:
+            self.skipped_steps += 1
+            return
+
+        self.step()
+        self.steps += 1
+
+    def step(self):
+        """Draw the next frame of the animation, and send it."""
+        raise NotImplementedError
+
+    def push_rows(self, first_row: int, last_row: int):
+        """Send only the given rows to the display, recording the cost."""
+
+        self.display.show(first_row=first_row, last_row=last_row)
+        # when double buffered, show() only hands the rows over to the
+        # transmitter, so wait for them to be sent before counting them
+        self.display.flush()
+        self.bytes_sent += self.display.bytes_sent
+
+    @property
+    def frame_rate(self) -> float:
+        """The number of steps per second for the time the timer has run."""
+
+        elapsed = self._run_ms
+        if self.running:
+            elapsed += time.ticks_diff(time.ticks_ms(), self._started_ms)
+        return (1000 * self.steps / elapsed) if elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_step(self) -> float:
+        """The average number of SPI bytes sent per step."""
+        return (self.bytes_sent / self.steps) if self.steps else 0.0
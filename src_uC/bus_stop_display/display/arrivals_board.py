@@ -0,0 +1,201 @@
+"""
+`arrivals_board`
+====================================================
+
+A retained-mode layer on top of the BusStopDisplay. Each
+item on the arrivals board is a widget that remembers the
+value it last drew, so only the widgets whose value has
+changed are cleared and redrawn, and only their rows are
+sent to the display.
+
+* Author: Kevin O'Connell
+
+"""
+
+try:
+    from typing import List, Tuple, Optional
+except ImportError:
+    pass
+
+from micropython import const
+
+from .bus_stop_display import BusStopDisplay
+from .bus_stop_display import CHAR_WIDTH, CHAR_HEIGHT
+from .bus_stop_display import ROUND_RECT_TEXT_VERT_TOTAL_MARGIN, ROUND_RECT_TEXT_HORZ_MARGIN
+from .bus_stop_display import ROUND_RECT_TEXT_TOP_MARGIN
+from .bus_stop_display import GLOBAL_LINE_PITCH
+from .st7920_display import TEXT_ROWS, TEXT_CHAR_HEIGHT
+
+
+# the title font is drawn 2 pixels above the top of the display, and
+# is 15 pixels high, so it covers the first 13 rows.
+TITLE_HEIGHT = const(13)
+
+CLOCK_X = const(91)
+CLOCK_Y = const(1)
+CLOCK_CHARS = const(5)
+
+SCHEDULE_Y = const(14)
+SCHEDULE_LINE_HEIGHT = const(CHAR_HEIGHT + ROUND_RECT_TEXT_VERT_TOTAL_MARGIN)
+
+# in text mode, each schedule line sits in one of the lower 3 rows
+# of the text grid, offset to line up with the character generator font.
+TEXT_MODE_SCHEDULE_Y_OFFSET = const(2)
+
+
+class Widget:
+    """A rectangular region of the display, holding the value it was
+    last drawn with. It's only redrawn when the value changes."""
+
+    def __init__(self, display: BusStopDisplay, x: int, y: int,
+                 width: int, height: int):
+        self.display = display
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+        self.value = None
+        self.dirty = True
+
+    def set(self, value):
+        """Set the value to draw, marking the widget dirty if it changed."""
+
+        if value != self.value:
+            self.value = value
+            self.dirty = True
+
+    def invalidate(self):
+        """Force the widget to be redrawn, e.g. after the frame was cleared."""
+        self.dirty = True
+
+    def render(self) -> bool:
+        """Clear the bounding box and redraw the widget if it's dirty.
+        Returns True if it was redrawn."""
+
+        if not self.dirty:
+            return False
+
+        self.display.display.fill_rect(self.x, self.y, self.width, self.height, 0)
+        if self.value is not None:
+            self.draw(self.value)
+
+        self.dirty = False
+        return True
+
+    def draw(self, value):
+        raise NotImplementedError
+
+
+class TitleWidget(Widget):
+    """The stop name, in the large font."""
+
+    def draw(self, value: str):
+        self.display.title_text(value, self.x, self.y, color=1)
+
+
+class ClockWidget(Widget):
+    """The current time, the value is the epoch time in minutes."""
+
+    def draw(self, value: int):
+        self.display.draw_clock(self.x, self.y, value * 60)
+
+
+class ScheduleLineWidget(Widget):
+    """One service on the board, the value is (route, headsign, minutes)."""
+
+    def __init__(self, display: BusStopDisplay, x: int, y: int, width: int,
+                 height: int, designation_min_char_width=None):
+        Widget.__init__(self, display, x, y, width, height)
+        self.designation_min_char_width = designation_min_char_width
+
+    def render(self) -> bool:
+        # any scrolling headsign on this line is replaced, or removed
+        # if the line is now blank.
+        if self.dirty and self.value is None and self.display.marquee is not None:
+            self.display.marquee.remove_line(self.y + ROUND_RECT_TEXT_TOP_MARGIN + 1)
+
+        # the minutes aren't in the bounding box in text mode
+        if self.dirty and self.value is None and self.display.text_mode:
+            self.display.clear_text_minutes(self.y)
+
+        return Widget.render(self)
+
+    def draw(self, value: Tuple[str, str, str]):
+        self.display.draw_schedule_line(self.y, *value,
+            designation_min_char_width=self.designation_min_char_width)
+
+
+class ArrivalsBoard:
+    """The title, clock and schedule line widgets for one arrivals board."""
+
+    def __init__(self, display: BusStopDisplay, line_count: int = 4,
+                 designation_min_char_width=None):
+        self.display = display
+
+        width = display.display.width
+        clock_width = (CLOCK_CHARS * (CHAR_WIDTH + 1)) - 1 + (2 * ROUND_RECT_TEXT_HORZ_MARGIN)
+
+        # the title can run underneath the clock, so it covers the full width
+        self.title = TitleWidget(display, 0, 0, width, TITLE_HEIGHT)
+        self.clock = ClockWidget(display, CLOCK_X, CLOCK_Y,
+                                 clock_width, SCHEDULE_LINE_HEIGHT)
+        if display.text_mode:
+            # the lines must line up with the rows of the text grid
+            line_count = min(line_count, TEXT_ROWS - 1)
+            line_y = [TEXT_CHAR_HEIGHT * (i + 1) + TEXT_MODE_SCHEDULE_Y_OFFSET
+                      for i in range(line_count)]
+        else:
+            line_y = [SCHEDULE_Y + (i * GLOBAL_LINE_PITCH) for i in range(line_count)]
+
+        self.lines = [ScheduleLineWidget(display, 0, y, width, SCHEDULE_LINE_HEIGHT,
+                                         designation_min_char_width)
+                      for y in line_y]
+
+        self.widgets = [self.title, self.clock] + self.lines
+
+    def update(self, title: str, epoch_time: int, lines: List[Tuple[str, str, str]]):
+        """Set the values for all widgets, lines beyond the number of
+        services given are left blank."""
+
+        self.title.set(title)
+        self.clock.set(epoch_time // 60)
+
+        for i, widget in enumerate(self.lines):
+            widget.set(tuple(lines[i]) if i < len(lines) else None)
+
+    def invalidate(self):
+        """Force every widget to be redrawn on the next render."""
+
+        for widget in self.widgets:
+            widget.invalidate()
+
+    @property
+    def dirty(self) -> bool:
+        return any(widget.dirty for widget in self.widgets)
+
+    def render(self, show: bool = True) -> int:
+        """Redraw the dirty widgets, and send only the rows they cover to
+        the display. Returns the number of widgets redrawn."""
+
+        # clearing the title box erases the clock, so it must be redrawn too
+        if self.title.dirty:
+            self.clock.invalidate()
+
+        redrawn = 0
+        first_row, last_row = self.display.display.height, 0
+
+        self.display.begin_drawing()
+        try:
+            for widget in self.widgets:
+                if widget.render():
+                    redrawn += 1
+                    first_row = min(first_row, widget.y)
+                    last_row = max(last_row, widget.y + widget.height)
+
+            if redrawn and show:
+                self.display.show(first_row=first_row, last_row=last_row)
+        finally:
+            self.display.end_drawing()
+
+        return redrawn
@@ -18,8 +18,14 @@ import time
 import micropython
 
 from micropython import const
-from .sprites import Hourglass
+from framebuf import FrameBuffer, MONO_HLSB
+
+from .hourglass import HourglassAnimation, HOURGLASS_SIZE
+from .lru_cache import LRUCache
+from .abbreviations import Abbreviator
+from .marquee import Marquee
 from .pico_spi_lcd import PiPico_SPI_LCD
+from .st7920_display import TEXT_COLUMNS, TEXT_CHAR_WIDTH, TEXT_CHAR_HEIGHT
 
 
 # dependant on the font used, char spacing is the minimum that
@@ -42,29 +48,110 @@ GLOBAL_HORZ_MARGIN = const(1)
 GLOBAL_LINE_PITCH = const((ROUND_RECT_TEXT_TOP_MARGIN + ROUND_RECT_TEXT_BTM_MARGIN +
                            CHAR_HEIGHT) + GLOBAL_LINE_SPACING)
 
+# in text mode, the minutes are drawn by the display's character generator,
+# right aligned in this many columns of the text grid.
+TEXT_MODE_MINUTES_CHARS = const(3)
+
+# the number of pre-rendered round rect badges to keep, i.e. the routes
+# served by the configured stops.
+BADGE_CACHE_COUNT = const(16)
+
+
+class Badge(FrameBuffer):
+    """A frame buffer holding a pre-rendered round rect with text."""
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        super().__init__(bytearray(((width + 7) // 8) * height), width, height, MONO_HLSB)
+
 
 class BusStopDisplay(PiPico_SPI_LCD):
 
     def __init__(self):
         PiPico_SPI_LCD.__init__(self)
 
+        # when enabled, headsigns too long for their line are scrolled
+        self.marquee = None
+
+        # when enabled, the minutes are written as text to the display's
+        # character generator, rather than drawn in the graphics RAM.
+        self.text_mode = False
+
+        # while a page is rendered off screen, text mode writes go into
+        # that page's copy of the text RAM, rather than the display.
+        self.offscreen_text = None
+
+        # pre-rendered round rects for the routes
+        self.badges = LRUCache(BADGE_CACHE_COUNT)
+
+        # the clock only ever changes to a new time, so it has its own
+        # badge, replaced each minute, rather than an entry in the cache.
+        self._clock_text = None
+        self._clock_badge = None
+
+        # headsigns shortened to fit their line, worked out once each
+        self.abbreviations = Abbreviator()
+
+        # shown while the main loop is blocked on the network
+        self.hourglass = HourglassAnimation(self)
+
+    def enable_marquee(self, frame_rate: int):
+        """Scroll overflowing headsigns at the given frame rate, rather
+        than truncating them."""
+        self.marquee = Marquee(self, frame_rate)
+
+    def enable_text_mode(self):
+        """Draw the minutes on each schedule line using the display's built
+        in text mode. The schedule lines must be aligned to the 16 pixel
+        rows of the text grid."""
+
+        self.text_mode = True
+        self.display.clear_text()
+
+    def _text_minutes_position(self, y: int):
+        """Return the text grid (row, column) of the minutes on the
+        schedule line at y."""
+        return y // TEXT_CHAR_HEIGHT, TEXT_COLUMNS - TEXT_MODE_MINUTES_CHARS
+
+    def clear_text_minutes(self, y: int):
+        """Blank the minutes of the schedule line at y, in text mode."""
+
+        row, column = self._text_minutes_position(y)
+        self.write_text(row, column, ' ' * TEXT_MODE_MINUTES_CHARS)
+
+    def write_text(self, row: int, column: int, text: str):
+        """Write text to the display's text RAM, or to the off screen
+        page's copy of it, if one is being rendered."""
+
+        if self.offscreen_text is None:
+            self.display.write_text(row, column, text)
+        else:
+            text = text[:TEXT_COLUMNS - column]
+            start = (row * TEXT_COLUMNS) + column
+            self.offscreen_text[start:start + len(text)] = text.encode()
+
     def one_px_round_rect(self, x: int, y: int, width: int, height: int,
-                          colour: int, opp_colour: int):
-        """Draw a rounded rect with a 2-pixel radius."""
+                          colour: int, opp_colour: int, fb: FrameBuffer = None):
+        """Draw a rounded rect with a 2-pixel radius, into the display's
+        frame buffer, unless another is given."""
+
+        if fb is None:
+            fb = self.display
 
         # draw the full un-rounded box
-        self.display.fill_rect(x, y, width, height, colour)
+        fb.fill_rect(x, y, width, height, colour)
 
         # draw the opposite colours to make the round rects
-        self.display.pixel(x, y, opp_colour)
-        self.display.pixel(x + width - 1, y, opp_colour)
-        self.display.pixel(x, y + height - 1, opp_colour)
-        self.display.pixel(x + width - 1, y + height - 1, opp_colour)
+        fb.pixel(x, y, opp_colour)
+        fb.pixel(x + width - 1, y, opp_colour)
+        fb.pixel(x, y + height - 1, opp_colour)
+        fb.pixel(x + width - 1, y + height - 1, opp_colour)
 
-    def round_rect_with_text(self, text: str, x: int, y: int, text_colour: int,
-                             back_colour: int, min_char_width=None) -> int:
-        """Draw a round rect that encompasses the text and then draw
-        the text inside the round rect."""
+    def _render_badge(self, text: str, text_colour: int, back_colour: int,
+                      min_char_width=None) -> FrameBuffer:
+        """Render a round rect that encompasses the text, with the text
+        inside it, into a new frame buffer the size of the round rect."""
 
         if min_char_width is not None:
             char_count = max(len(text), min_char_width)
@@ -79,16 +166,41 @@ class BusStopDisplay(PiPico_SPI_LCD):
 
         # draw the background box, with colours inverted since the box is the background
         box_total_width = (char_count * CHAR_WIDTH) + char_count - 1 + (2 * ROUND_RECT_TEXT_HORZ_MARGIN)
-        self.one_px_round_rect(x, y, width=box_total_width,
-            height=CHAR_HEIGHT + ROUND_RECT_TEXT_VERT_TOTAL_MARGIN,
-            colour=back_colour, opp_colour=text_colour)
+        box_height = CHAR_HEIGHT + ROUND_RECT_TEXT_VERT_TOTAL_MARGIN
+        badge = Badge(box_total_width, box_height)
+
+        self.one_px_round_rect(0, 0, width=box_total_width, height=box_height,
+                               colour=back_colour, opp_colour=text_colour, fb=badge)
 
         # draw the text
-        self.text(text, x + ROUND_RECT_TEXT_HORZ_MARGIN + x_offset,
-                  y + ROUND_RECT_TEXT_TOP_MARGIN + 1,
-                  text_colour)
+        self.standard_text.text(badge, text, ROUND_RECT_TEXT_HORZ_MARGIN + x_offset,
+                                ROUND_RECT_TEXT_TOP_MARGIN + 1, text_colour)
+
+        return badge
+
+    def round_rect_with_text(self, text: str, x: int, y: int, text_colour: int,
+                             back_colour: int, min_char_width=None) -> int:
+        """Draw a round rect that encompasses the text and then draw
+        the text inside the round rect. Each distinct badge is only
+        rendered once, and blitted from the badge cache after that."""
+
+        key = (text, min_char_width, text_colour, back_colour)
+        badge = self.badges.get(key)
+        if badge is None:
+            badge = self.badges.put(key, self._render_badge(text, text_colour, back_colour,
+                                                            min_char_width))
+
+        self.display.blit(badge, x, y)
+        return x + badge.width
 
-        return x + box_total_width
+    def prerender_badges(self, texts, min_char_width=None):
+        """Fill the badge cache up front, e.g. with the routes seen in the
+        backend responses, drawn as they are on the schedule lines."""
+
+        for text in texts:
+            key = (text, min_char_width, 0, 1)
+            if key not in self.badges:
+                self.badges.put(key, self._render_badge(text, 0, 1, min_char_width))
 
     def draw_schedule_line(self, y: int, service_designation: str, service_terminus: str,
                            minutes: str, designation_min_char_width=None):
@@ -104,15 +216,26 @@ class BusStopDisplay(PiPico_SPI_LCD):
         terminus_x_right = x_right + (ROUND_RECT_TEXT_HORZ_MARGIN + ROUND_RECT_TEXT_TOP_MARGIN)
         terminus_y = y + ROUND_RECT_TEXT_TOP_MARGIN + 1
 
-        minutes_x_left = self.display.width - (CHAR_PITCH * len(minutes)) - GLOBAL_HORZ_MARGIN
+        if self.text_mode:
+            minutes_x_left = self.display.width - (TEXT_CHAR_WIDTH * len(minutes))
+        else:
+            minutes_x_left = self.display.width - (CHAR_PITCH * len(minutes)) - GLOBAL_HORZ_MARGIN
         max_chars = ((minutes_x_left - terminus_x_right) // CHAR_PITCH) - 1
-        terminus_overflowing = len(service_terminus) > max_chars
+        fitted_terminus, terminus_overflowing = self.abbreviations.fit(service_terminus, max_chars)
 
-        # draw the service terminus name
-        self.text(service_terminus[:max_chars], terminus_x_right,
-                  terminus_y, 1)
+        if terminus_overflowing and self.marquee is not None:
+            # scroll the full name, in the width the dots would have used
+            self.marquee.set_line(self.standard_text, service_terminus,
+                                  terminus_x_right, terminus_y,
+                                  (max_chars + 1) * CHAR_PITCH, CHAR_HEIGHT)
+        else:
+            if self.marquee is not None:
+                self.marquee.remove_line(terminus_y)
+
+            # draw the service terminus name
+            self.text(fitted_terminus, terminus_x_right, terminus_y, 1)
 
-        if terminus_overflowing:
+        if terminus_overflowing and self.marquee is None:
             dot_x_right = terminus_x_right + (max_chars * CHAR_PITCH)
             # if the terminus name is too long, draw two dots to show it should continue
             self.display.pixel(dot_x_right + 1, terminus_y + CHAR_HEIGHT - 2, 1)
@@ -120,8 +243,12 @@ class BusStopDisplay(PiPico_SPI_LCD):
             self.display.pixel(dot_x_right + 5, terminus_y + CHAR_HEIGHT - 2, 1)
 
         # draw the minutes until the service departure
-        self.text(minutes, self.display.width - (CHAR_PITCH * len(minutes)) - GLOBAL_HORZ_MARGIN,
-                  y + ROUND_RECT_TEXT_TOP_MARGIN + 1, 1)
+        if self.text_mode:
+            row, column = self._text_minutes_position(y)
+            padding = ' ' * (TEXT_MODE_MINUTES_CHARS - len(minutes))
+            self.write_text(row, column, padding + minutes)
+        else:
+            self.text(minutes, minutes_x_left, y + ROUND_RECT_TEXT_TOP_MARGIN + 1, 1)
 
     def draw_schedule_lines(self, y: int, lines: List[Tuple[str, str, str]],
                             designation_min_char_width=None):
@@ -137,18 +264,21 @@ class BusStopDisplay(PiPico_SPI_LCD):
         t = time.localtime(epoch_time)
         hours, mins = f'{t[3]:02d}', f'{t[4]:02d}'
 
-        # draw the service designation
-        self.round_rect_with_text(f'{hours}:{mins}', x=x, y=y,
-                                  text_colour=0, back_colour=1)
-
-    def hourglass_animation(self, x, y, delay=0.2):
-        """Show an hourglass waiting animation."""
+        text = f'{hours}:{mins}'
+        if text != self._clock_text:
+            self._clock_badge = self._render_badge(text, text_colour=0, back_colour=1)
+            self._clock_text = text
 
-        self.display.clear_framebuffer()
+        self.display.blit(self._clock_badge, x, y)
 
-        for frame in Hourglass.frames:
-            self.display.blit(frame, x, y)
-            self.display.show()
+    def loading(self, x: int = None, y: int = None, start_delay_ms: int = 0) -> HourglassAnimation:
+        """Return the hourglass animation, placed at the given position, or
+        the centre of the display, to be used as a context manager around
+        slow network calls. It's animated from a timer, so it doesn't block."""
 
-            time.sleep(delay)
+        if x is None:
+            x = (self.display.width - HOURGLASS_SIZE) // 2
+        if y is None:
+            y = (self.display.height - HOURGLASS_SIZE) // 2
 
+        return self.hourglass.place(x, y, start_delay_ms)
@@ -0,0 +1,102 @@
+"""
+`font_atlas`
+====================================================
+
+A RAM resident copy of the 5x8 font, stored as a glyph atlas
+in a MONO_HLSB buffer, with text drawn using FrameBuffer.blit
+
+* Author: Kevin O'Connell
+
+"""
+
+from micropython import const
+from framebuf import FrameBuffer, MONO_HLSB
+
+
+# the glyph to draw for any character not in the font file
+_MISSING_GLYPH = const(ord('?'))
+
+
+def _make_palette(colour: int):
+    """Make a 2 colour palette mapping font pixels to the given colour,
+    with the background mapped to the opposite colour."""
+
+    # MONO_HLSB, so pixel 0 is the MSB
+    buf = bytearray(1)
+    palette = FrameBuffer(buf, 2, 1, MONO_HLSB)
+    palette.pixel(0, 0, 1 - colour)
+    palette.pixel(1, 0, colour)
+    return palette
+
+
+class FontAtlas:
+    """Load the whole font file once into memory, and draw text with
+    one blit per character, rather than one pixel at a time."""
+
+    def __init__(self, font_name: str):
+        with open(font_name, 'rb') as f:
+            self.width, self.height = f.read(2)
+            columns = f.read()
+
+        # The font file stores each glyph as `width` column bytes, with the
+        # LSB at the top. The atlas stores each glyph as `height` row bytes,
+        # MONO_HLSB, so the MSB is the left-most pixel.
+        self.glyph_count = len(columns) // self.width
+        self._atlas = memoryview(bytearray(self.glyph_count * self.height))
+
+        for glyph in range(self.glyph_count):
+            for char_x in range(self.width):
+                column = columns[(glyph * self.width) + char_x]
+                for char_y in range(self.height):
+                    if (column >> char_y) & 0x1:
+                        self._atlas[(glyph * self.height) + char_y] |= 0x80 >> char_x
+
+        # a frame buffer view into the atlas, created the first time
+        # each glyph is drawn.
+        self._glyphs = [None] * self.glyph_count
+
+        # the palettes are indexed by the text colour
+        self._palettes = (_make_palette(0), _make_palette(1))
+
+    def glyph(self, ch: str) -> FrameBuffer:
+        """Return the frame buffer for the given character."""
+
+        index = ord(ch)
+        if index >= self.glyph_count:
+            index = _MISSING_GLYPH
+
+        glyph = self._glyphs[index]
+        if glyph is None:
+            start = index * self.height
+            glyph = FrameBuffer(self._atlas[start:start + self.height],
+                                self.width, self.height, MONO_HLSB)
+            self._glyphs[index] = glyph
+
+        return glyph
+
+    def text(self, fb: FrameBuffer, string: str, x: int, y: int, colour: int):
+        """Draw the string into the frame buffer, only setting the pixels
+        of each glyph, leaving the background untouched."""
+
+        # the background of each glyph is mapped to the opposite colour,
+        # and then made transparent by using it as the key colour.
+        palette = self._palettes[colour]
+        key = 1 - colour
+        pitch = self.width + 1
+
+        for ch in string:
+            fb.blit(self.glyph(ch), x, y, key, palette)
+            x += pitch
+
+    def text_width(self, string: str) -> int:
+        """Return the pixel width of the specified text message."""
+        return len(string) * (self.width + 1)
+
+    def strip_size(self, string: str):
+        """Return the (width, height) of the string, without the trailing
+        gap after the last character."""
+        return max(self.text_width(string) - 1, 0), self.height
+
+    def render_strip(self, fb: FrameBuffer, string: str, colour: int):
+        """Render the string at the top left of the frame buffer."""
+        self.text(fb, string, 0, 0, colour)
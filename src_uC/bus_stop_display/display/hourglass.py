@@ -0,0 +1,108 @@
+"""
+`hourglass`
+====================================================
+
+A loading animation, shown while the main loop is blocked on
+slow network work, such as connecting to wifi, getting the
+time, or fetching arrivals with retries.
+
+* Author: Kevin O'Connell
+
+"""
+
+import time
+
+from micropython import const
+from framebuf import FrameBuffer, MONO_HLSB
+
+from .animation import TimerAnimation
+from .sprites import Hourglass
+
+
+# the time each frame of the hourglass is shown for
+_HOURGLASS_PERIOD_MS = const(200)
+HOURGLASS_SIZE = const(24)
+
+
+class HourglassAnimation(TimerAnimation):
+    """Cycle through the hourglass frames from a timer, sending only the
+    sprite's rows each step. Used as a context manager around the
+    blocking call, i.e.:
+
+        with display.loading(x, y, start_delay_ms=1000):
+            do_slow_network_things()
+
+    If the call finishes within the start delay, nothing is drawn. Once
+    shown, whatever was under the hourglass is restored when it stops."""
+
+    def __init__(self, display):
+        TimerAnimation.__init__(self, display, _HOURGLASS_PERIOD_MS)
+
+        self.x = 0
+        self.y = 0
+        self.start_delay_ms = 0
+
+        self._frame_index = 0
+        self._shown = False
+
+        # whatever was under the hourglass before it was first shown
+        self._backup = FrameBuffer(bytearray((HOURGLASS_SIZE // 8) * HOURGLASS_SIZE),
+                                   HOURGLASS_SIZE, HOURGLASS_SIZE, MONO_HLSB)
+
+    def place(self, x: int, y: int, start_delay_ms: int = 0):
+        """Set where the hourglass is drawn, and how long to wait
+        before showing it, ready to be started."""
+
+        self.x = x
+        self.y = y
+        self.start_delay_ms = start_delay_ms
+        return self
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        self._frame_index = 0
+        self._shown = False
+        TimerAnimation.start(self)
+
+    def stop(self):
+        TimerAnimation.stop(self)
+
+        if self._shown:
+            # this runs in the main loop, so hold off the other animations'
+            # steps while the restored rows are sent.
+            self.display.begin_drawing()
+            try:
+                self.hide()
+                self.push_rows(self.y, self.y + HOURGLASS_SIZE)
+            finally:
+                self.display.end_drawing()
+
+    def hide(self):
+        """Restore whatever was under the hourglass into the frame buffer,
+        without sending it, e.g. before the frame is swapped for another
+        page's. If it's still running, the next step takes a new backup
+        and draws it over whatever frame is there then."""
+
+        if self._shown:
+            self._shown = False
+            self.display.display.blit(self._backup, self.x, self.y)
+
+    def step(self):
+        if not self._shown:
+            if time.ticks_diff(time.ticks_ms(), self._started_ms) < self.start_delay_ms:
+                return
+
+            self._backup.blit(self.display.display, -self.x, -self.y)
+            self._shown = True
+
+        frames = Hourglass.frames
+        self.display.display.blit(frames[self._frame_index], self.x, self.y)
+        self._frame_index = (self._frame_index + 1) % len(frames)
+
+        self.push_rows(self.y, self.y + HOURGLASS_SIZE)
@@ -0,0 +1,72 @@
+"""
+`lru_cache`
+====================================================
+
+A least-recently-used cache, bounded by a budget rather
+than an entry count, to keep the heap usage predictable.
+
+* Author: Kevin O'Connell
+
+"""
+
+from collections import OrderedDict
+
+
+class LRUCache:
+    """A cache that evicts the least recently used entries once the total
+    cost of all entries would exceed the budget. The cost of an entry is
+    whatever unit the budget is in, e.g. bytes, or 1 to bound the count."""
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.used = 0
+
+        # maps key -> (value, cost), ordered from least to most recently used
+        self._entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Return the cached value for key, or None if it's not cached."""
+
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        # re-inserting moves the entry to the most recently used end
+        self._entries[key] = entry
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value, cost: int = 1):
+        """Add the value to the cache, evicting the least recently used
+        entries to make room. Values costing more than the whole budget
+        aren't cached. The value is returned for convenience."""
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.used -= old[1]
+
+        if cost > self.budget:
+            return value
+
+        while self.used + cost > self.budget:
+            oldest = next(iter(self._entries))
+            self.used -= self._entries.pop(oldest)[1]
+
+        self._entries[key] = (value, cost)
+        self.used += cost
+        return value
+
+    def clear(self):
+        """Remove all entries, leaving the hit/miss counters untouched."""
+        self._entries = OrderedDict()
+        self.used = 0
@@ -0,0 +1,126 @@
+"""
+`marquee`
+====================================================
+
+Scroll text that doesn't fit in its space on the display,
+such as long headsigns, horizontally at a steady rate.
+
+* Author: Kevin O'Connell
+
+"""
+
+from micropython import const
+from framebuf import FrameBuffer, MONO_HLSB
+
+from .animation import TimerAnimation
+from .text_cache import TextStrip
+
+
+# the gap in pixels between the end of the text and the start
+# of the next repetition as it scrolls around.
+_MARQUEE_GAP = const(18)
+
+
+class MarqueeLine:
+    """A window onto a strip of text rendered for the line, scrolled by one
+    pixel each step, wrapping around with a gap between repetitions. The
+    line owns its strip, so it's never evicted from under it."""
+
+    def __init__(self, font, text: str, x: int, y: int, width: int, height: int):
+        self.font = font
+        self.text = text
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.offset = 0
+
+        text_width, text_height = font.strip_size(text)
+        self.strip = TextStrip(text_width, text_height)
+        font.render_strip(self.strip, text, 1)
+        self.period = text_width + _MARQUEE_GAP
+
+        self.window = FrameBuffer(bytearray(((width + 7) // 8) * height),
+                                  width, height, MONO_HLSB)
+
+    def matches(self, font, text: str, x: int, width: int, height: int) -> bool:
+        """Whether the line already scrolls this text in the same region."""
+        return (self.text == text and self.font is font and self.x == x
+                and self.width == width and self.height == height)
+
+    def draw(self, fb: FrameBuffer):
+        """Copy the current window of the strip into the frame buffer. The
+        window is blitted without a key colour, so it clears the region."""
+
+        self.window.fill(0)
+        self.window.blit(self.strip, -self.offset, 0, 0)
+        self.window.blit(self.strip, self.period - self.offset, 0, 0)
+        fb.blit(self.window, self.x, self.y)
+
+    def advance(self):
+        self.offset = (self.offset + 1) % self.period
+
+
+class Marquee(TimerAnimation):
+    """Scroll every registered line, pushing only the rows of each line.
+    The timer only runs while there are lines to scroll."""
+
+    def __init__(self, display, frame_rate: int):
+        TimerAnimation.__init__(self, display, 1000 // frame_rate)
+
+        # maps the y coordinate of each line to its MarqueeLine
+        self._lines = {}
+        self._offscreen = False
+
+    def set_line(self, font, text: str, x: int, y: int, width: int, height: int):
+        """Start scrolling the text in the given region, replacing any
+        line already at y, unless it's scrolling the same text there, in
+        which case it carries on from where it was. The current window is
+        drawn immediately, but not sent, since that's left to whoever is
+        drawing the frame."""
+
+        line = self._lines.get(y)
+        if line is None or not line.matches(font, text, x, width, height):
+            line = MarqueeLine(font, text, x, y, width, height)
+            self._lines[y] = line
+
+        line.draw(self.display.display)
+        self._update_timer()
+
+    def remove_line(self, y: int):
+        """Stop scrolling the line at y, if there is one."""
+
+        if self._lines.pop(y, None) is not None:
+            self._update_timer()
+
+    def use_lines(self, lines: dict, offscreen: bool = False) -> dict:
+        """Scroll a different set of lines, e.g. those of another page,
+        returning the set that was in use. Offscreen lines are only drawn
+        into, while a page that isn't visible is rendered, so the timer is
+        left as it is for the visible lines."""
+
+        old, self._lines = self._lines, lines
+        self._offscreen = offscreen
+        self._update_timer()
+        return old
+
+    def _update_timer(self):
+        # the timer only runs while the visible page has lines to scroll
+        if self._offscreen:
+            return
+
+        if self._lines:
+            self.start()
+        else:
+            self.stop()
+
+    def step(self):
+        first_row, last_row = self.display.display.height, 0
+        for line in self._lines.values():
+            line.advance()
+            line.draw(self.display.display)
+            first_row = min(first_row, line.y)
+            last_row = max(last_row, line.y + line.height)
+
+        if last_row:
+            self.push_rows(first_row, last_row)
@@ -4,6 +4,7 @@
 #
 
 import struct, framebuf
+from .lru_cache import LRUCache
 
 # This is a lookup table for fasth computation of sin() and cos() functions
 # of degrees from 0 to 360. At postion "A" the table stores sin(A)*64+64,
@@ -25,7 +26,9 @@ def fast_cos(angle): return fast_sin(angle+90)
 
 
 class MicroFont:
-    def __init__(self,filename,cache_index = False, cache_chars = False):
+    # If cache_budget is given, the character cache is bounded to that
+    # many bytes of glyph data, evicting the least recently used glyphs.
+    def __init__(self,filename,cache_index = False, cache_chars = False, cache_budget = None):
         stream = open(filename,"rb")
         header_data = stream.read(12)
         if len(header_data) != 12:
@@ -39,10 +42,11 @@ class MicroFont:
         self.max_width = max_width
         self.monospaced = True if monospaced else False
         self.index_len = index_len # Sparse index length on disk.
-        self.cache_chars = cache_chars
-        self.cache_index = cache_index or cache_chars
+        self.cache_chars = cache_chars or cache_budget is not None
+        self.cache_index = cache_index or self.cache_chars
+        self.cache_budget = cache_budget
         self.index = None
-        self.cache = {}
+        self.cache = {} if cache_budget is None else LRUCache(cache_budget)
         self.stream = stream # We keep the file open for lower latecy.
 
     def height(): return self.height
@@ -67,8 +71,9 @@ class MicroFont:
     # Return the character bitmap (horizontally mapped, and horizontally
     # padded to whole bytes), the height and width in pixels.
     def get_ch(self, ch):
-        if self.cache_chars and ch in self.cache:
-            return self.cache[ch]
+        if self.cache_chars:
+            retval = self.cache.get(ch)
+            if retval is not None: return retval
 
         # Read the index in memory, if not cached.
         if self.index != None:
@@ -89,7 +94,11 @@ class MicroFont:
         char_data_len = (width + 7)//8 * self.height
         char_data = self.stream.read(char_data_len)
         retval = char_data, self.height, width
-        if self.cache_chars: self.cache[ch] = retval
+        if self.cache_chars:
+            if self.cache_budget is None:
+                self.cache[ch] = retval
+            else:
+                self.cache.put(ch, retval, char_data_len)
         return retval
 
     # Lowlevel framebuffer function. That's the core of the library, as handles
@@ -131,6 +140,36 @@ class MicroFont:
                         fb16 = ptr16(fb)
                         fb16[fb_word] = color
 
+    # Fast path for unrotated text into MONO_HLSB framebuffers. Since there's
+    # no rotation, each byte of a glyph row maps onto at most two bytes of
+    # the framebuffer row, so there's no need for the fixed point math or
+    # the oversampling, and the glyph bits are shifted and copied a byte at
+    # a time. Only the set pixels are drawn, like draw_ch_blit().
+    @micropython.viper
+    def draw_ch_blit_rot0(self, fb:ptr8, fb_width:int, fb_height:int, ch_buf:ptr8, ch_width:int, ch_height:int, dst_x:int, dst_y:int, color:int):
+        fb_stride = fb_width >> 3
+        ch_stride = ch_width >> 3
+        shift = dst_x & 7
+        for y in range(ch_height):
+            dy = dst_y + y
+            if dy < 0 or dy >= fb_height: continue
+            row = dy * fb_stride
+            for b in range(ch_stride):
+                bits = ch_buf[ch_stride*y + b]
+                if bits == 0: continue
+                # the framebuffer byte holding the left-most pixel of this
+                # glyph byte, and the bits spilling into the next byte.
+                col = (dst_x + (b << 3)) >> 3
+                left = bits >> shift
+                right = (bits << (8 - shift)) & 0xff
+                if 0 <= col and col < fb_stride and left != 0:
+                    if color: fb[row + col] = fb[row + col] | left
+                    else: fb[row + col] = fb[row + col] & (0xff ^ left)
+                col += 1
+                if 0 <= col and col < fb_stride and right != 0:
+                    if color: fb[row + col] = fb[row + col] | right
+                    else: fb[row + col] = fb[row + col] & (0xff ^ right)
+
     # Write a character in the destination MicroPython framebuffer 'fb'
     # setting all the pixels that are set on the font to 'color'.
     # The character 'ch' must be obtained with the get_ch() method.
@@ -173,7 +212,9 @@ class MicroFont:
 
         # Call the lower level function depending on the target
         # framebuffer color mode.
-        if fb_fmt == framebuf.MONO_HLSB:
+        if fb_fmt == framebuf.MONO_HLSB and rot == 0:
+            self.draw_ch_blit_rot0(fb,fb_width,fb_height,ch_buf,ch_width,ch_height,dst_x+off_x,dst_y+off_y,color)
+        elif fb_fmt == framebuf.MONO_HLSB:
             fb_len = fb_width*fb_height//8
             self.draw_ch_blit(fb,fb_width,fb_len,ch_buf,ch_width,ch_height,dst_x,dst_y,off_x,off_y,color,sin,cos,COLORMODE_MONO_HLSB)
         elif fb_fmt == framebuf.RGB565:
@@ -0,0 +1,127 @@
+"""
+`pages`
+====================================================
+
+One arrivals board per configured stop, each with its own
+copy of the frame. Boards not on screen are rendered in the
+background when their data changes, so switching pages is
+only a buffer swap and an SPI push.
+
+* Author: Kevin O'Connell
+
+"""
+
+try:
+    from typing import List, Tuple
+except ImportError:
+    pass
+
+from .arrivals_board import ArrivalsBoard
+from .bus_stop_display import BusStopDisplay
+from .st7920_display import TEXT_ROWS, TEXT_COLUMNS
+
+
+class Page:
+    """An arrivals board, and the parts of the display it owns while
+    it's off screen: the frame, the text RAM and any scrolling lines."""
+
+    def __init__(self, display: BusStopDisplay, designation_min_char_width=None):
+        self.board = ArrivalsBoard(display, designation_min_char_width=designation_min_char_width)
+        self.frame = bytearray(len(display.display.framebuf))
+        self.text = bytearray(b' ' * (TEXT_ROWS * TEXT_COLUMNS))
+        self.marquee_lines = {}
+
+
+class Pages:
+    """A set of pages, only one of which is visible at a time."""
+
+    def __init__(self, display: BusStopDisplay, count: int,
+                 designation_min_char_width=None, visible: int = 0):
+        self.display = display
+        self.pages = [Page(display, designation_min_char_width) for _ in range(count)]
+        self.visible = visible
+
+        # the visible page's lines are the ones being scrolled
+        if display.marquee is not None:
+            display.marquee.use_lines(self.pages[visible].marquee_lines)
+
+        self.swaps = 0
+
+    def __len__(self):
+        return len(self.pages)
+
+    def render(self, index: int, title: str, epoch_time: int,
+               lines: List[Tuple[str, str, str]]) -> int:
+        """Update the board of the given page, redrawing the widgets that
+        changed. The visible page is drawn straight onto the display, any
+        other page into its own frame. Returns the number of widgets redrawn."""
+
+        page = self.pages[index]
+        page.board.update(title, epoch_time, lines)
+        if not page.board.dirty:
+            return 0
+
+        if index == self.visible:
+            return page.board.render()
+
+        display = self.display
+        framebuf = display.display.framebuf
+
+        display.begin_drawing()
+        try:
+            # park the visible frame in its page while this one is drawn
+            self.pages[self.visible].frame[:] = framebuf
+            framebuf[:] = page.frame
+
+            display.offscreen_text = page.text
+            if display.marquee is not None:
+                visible_lines = display.marquee.use_lines(page.marquee_lines, offscreen=True)
+
+            try:
+                redrawn = page.board.render(show=False)
+            finally:
+                display.offscreen_text = None
+                if display.marquee is not None:
+                    display.marquee.use_lines(visible_lines)
+
+                page.frame[:] = framebuf
+                framebuf[:] = self.pages[self.visible].frame
+        finally:
+            display.end_drawing()
+
+        return redrawn
+
+    def show(self, index: int):
+        """Make the given page visible. Its frame is already rendered,
+        so only the rows that differ from the current page are sent."""
+
+        if index == self.visible:
+            return
+
+        display = self.display
+        framebuf = display.display.framebuf
+        current, page = self.pages[self.visible], self.pages[index]
+
+        display.begin_drawing()
+        try:
+            # the hourglass may be up, mid-fetch, so the current page is
+            # parked without it, and it's drawn again over the new page.
+            display.hourglass.hide()
+
+            current.frame[:] = framebuf
+            framebuf[:] = page.frame
+
+            if display.text_mode:
+                current.text[:] = display.display.text_shadow
+                for row in range(TEXT_ROWS):
+                    start = row * TEXT_COLUMNS
+                    display.display.write_text(row, 0, page.text[start:start + TEXT_COLUMNS].decode())
+
+            if display.marquee is not None:
+                display.marquee.use_lines(page.marquee_lines)
+
+            self.visible = index
+            display.show()
+            self.swaps += 1
+        finally:
+            display.end_drawing()
@@ -1,10 +1,10 @@
 
 from machine import SPI, Pin
 from micropython import const
-from framebuf import MONO_HLSB
 
-from .font import FontRenderer
+from .font_atlas import FontAtlas
 from .microfont import MicroFont
+from .text_cache import TextStripCache, MicroFontRenderer
 from .st7920_display import ST7920
 
 # chip select is active high, so set to zero.
@@ -24,6 +24,12 @@ DISPLAY_WIDTH = const(128)
 
 ASSETS = const('/bus_stop_display/assets/')
 
+# the maximum bytes of glyph data the title font keeps in memory
+TITLE_GLYPH_CACHE_BYTES = const(2048)
+
+# the maximum bytes of pre-rendered strings kept in memory
+TEXT_STRIP_CACHE_BYTES = const(6144)
+
 
 class PiPico_SPI_LCD:
     """A container class to create the SPI device object."""
@@ -40,14 +46,30 @@ class PiPico_SPI_LCD:
 
         # TODO: clean up the use of two libraries, should only
         #       need on for rendering both sizes
-        fr = FontRenderer(DISPLAY_WIDTH, DISPLAY_HEIGHT,
-                          self.display.pixel,
-                          font_name=ASSETS + 'font5x8.bin')
-        self.standard_text = fr.__enter__()
+        self.standard_text = FontAtlas(ASSETS + 'font5x8.bin')
 
         # the 15 point font is roughly 10 pixels high.
         # Some characters are 11 pixels though.
-        self.large_text = MicroFont(ASSETS + 'victor_R_15.mfnt')
+        self.large_text = MicroFont(ASSETS + 'victor_R_15.mfnt', cache_index=True,
+                                    cache_budget=TITLE_GLYPH_CACHE_BYTES)
+
+        # -1 spacing because the large font characters are quite wide!
+        self._title_renderer = MicroFontRenderer(self.large_text, x_spacing=-1)
+
+        # all text is drawn through the cache of pre-rendered strings
+        self.text_strips = TextStripCache(TEXT_STRIP_CACHE_BYTES)
+
+        # non-zero while the main loop is drawing a frame, so animations
+        # running from timers don't draw into a half finished frame.
+        self.busy = 0
+
+    def begin_drawing(self):
+        """Mark the frame buffer as being drawn by the main loop."""
+        self.busy += 1
+
+    def end_drawing(self):
+        """Mark the frame buffer as no longer being drawn by the main loop."""
+        self.busy -= 1
 
     def clear_framebuffer(self):
         self.display.clear_framebuffer()
@@ -63,22 +85,38 @@ class PiPico_SPI_LCD:
 
     def text(self, string, x, y, colour):
         """Render standard 8x5 characters."""
-        self.standard_text.text(string, x, y, colour)
+        self.text_strips.draw(self.display, self.standard_text, string, x, y, colour)
 
     def title_text(self, string: str, x: int, y: int, color: int):
         """Render large text, roughly 10 pixels high."""
 
         # subtracting 2 from the y coordinate because the 15 point font
-        # doesn't start at the top of the bounding box. -1 spacing because
-        # they are also quite wide!
-        self.large_text.write(string, self.display, MONO_HLSB,
-                              self.display.width, self.display.height,
-                              x, y - 2, color, x_spacing=-1)
+        # doesn't start at the top of the bounding box.
+        self.text_strips.draw(self.display, self._title_renderer, string, x, y - 2, color)
 
     def draw_sprite(self, sprite, x, y, color):
         """Draw a sprite"""
 
         #self.display.blit
 
-    def show(self):
-        self.display.show()
+    def start_background_transmitter(self):
+        """Transmit frames from the second core while the next one is drawn.
+        Returns False if threads aren't available, staying synchronous."""
+        return self.display.start_background_transmitter()
+
+    def show(self, full=False, first_row=0, last_row=None):
+        self.display.show(full=full, first_row=first_row, last_row=last_row)
+
+    def flush(self):
+        """Wait for any frame being transmitted in the background."""
+        self.display.flush()
+
+    @property
+    def rows_sent(self):
+        """The number of display rows sent for the last transmitted frame"""
+        return self.display.rows_sent
+
+    @property
+    def bytes_sent(self):
+        """The number of SPI bytes sent for the last transmitted frame"""
+        return self.display.bytes_sent
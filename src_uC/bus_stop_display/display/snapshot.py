@@ -0,0 +1,150 @@
+"""
+`snapshot`
+====================================================
+
+Compress the frame buffer into small snapshots, to mirror the
+screen remotely. Each snapshot is run-length encoded, either
+as a key frame, or as a delta against the previous snapshot,
+which is mostly zeros, since little changes between frames.
+
+The format, decoded by `tools/snapshot_decoder.py`, is:
+
+    byte 0:     flags, bit 0 = delta, bit 1 = text RAM follows
+    byte 1:     width / 8
+    byte 2:     height
+    byte 3..4:  sequence number, big endian, wrapping at 65536
+    byte 5..:   the frame, or the XOR with the previous snapshot,
+                in PackBits, followed by the raw text RAM, if any.
+
+PackBits is a control byte n, followed by n + 1 literal bytes for
+n < 128, or a single byte repeated 257 - n times for n > 128.
+
+* Author: Kevin O'Connell
+
+"""
+
+import micropython
+from micropython import const
+
+
+SNAPSHOT_DELTA = const(0x01)
+SNAPSHOT_TEXT = const(0x02)
+
+_HEADER_BYTES = const(5)
+_MAX_RUN = const(128)
+
+
+@micropython.viper
+def pack_bits(frame: ptr8, previous: ptr8, length: int, out: ptr8, delta: int) -> int:
+    """PackBits encode the frame into out, XOR'ed with the previous frame
+    if delta is set. Returns the number of bytes written, at most
+    length + (length // 128) + 1."""
+
+    mask = 0
+    if delta:
+        mask = 0xFF
+
+    i = 0
+    o = 0
+    while i < length:
+        value = frame[i] ^ (previous[i] & mask)
+
+        # measure the run of bytes the same as this one
+        j = i + 1
+        while j < length and (j - i) < _MAX_RUN and (frame[j] ^ (previous[j] & mask)) == value:
+            j += 1
+
+        if j - i > 1:
+            out[o] = 257 - (j - i)
+            out[o + 1] = value
+            o += 2
+            i = j
+            continue
+
+        # copy literals up to the start of the next run of 3 or more
+        start = i
+        control = o
+        o += 1
+        while i < length and (i - start) < _MAX_RUN:
+            value = frame[i] ^ (previous[i] & mask)
+            if i + 2 < length:
+                if ((frame[i + 1] ^ (previous[i + 1] & mask)) == value and
+                        (frame[i + 2] ^ (previous[i + 2] & mask)) == value):
+                    break
+            out[o] = value
+            o += 1
+            i += 1
+        out[control] = i - start - 1
+
+    return o
+
+
+@micropython.viper
+def frames_equal(a: ptr8, b: ptr8, length: int) -> bool:
+    for i in range(length):
+        if a[i] != b[i]:
+            return False
+    return True
+
+
+class SnapshotEncoder:
+    """Encode snapshots of the display, each as a delta against the last,
+    except for key frames, which are sent periodically, or on request, so
+    a new viewer can start decoding."""
+
+    def __init__(self, display, key_frame_interval: int = 20):
+        self.display = display
+        self.key_frame_interval = key_frame_interval
+
+        frame_size = len(display.framebuf)
+        self._previous = bytearray(frame_size)
+        self._out = bytearray(_HEADER_BYTES + frame_size + (frame_size // _MAX_RUN) + 1 +
+                              len(display.text_shadow))
+
+        self.sequence = 0
+        self._since_key_frame = key_frame_interval
+        self._previous_text = bytes(display.text_shadow)
+
+    def request_key_frame(self):
+        """Make the next snapshot a key frame."""
+        self._since_key_frame = self.key_frame_interval
+
+    @property
+    def changed(self) -> bool:
+        """True if the screen has changed since the last snapshot."""
+
+        return (not frames_equal(self.display.framebuf, self._previous, len(self._previous))
+                or self.display.text_shadow != self._previous_text)
+
+    def encode(self) -> memoryview:
+        """Return the next snapshot, only valid until the next call."""
+
+        display = self.display
+        frame = display.framebuf
+        out = self._out
+
+        delta = self._since_key_frame < self.key_frame_interval
+        if delta:
+            self._since_key_frame += 1
+        else:
+            self._since_key_frame = 1
+
+        text = display.text_shadow
+        with_text = text != b' ' * len(text)
+
+        out[0] = (SNAPSHOT_DELTA if delta else 0) | (SNAPSHOT_TEXT if with_text else 0)
+        out[1] = display.width // 8
+        out[2] = display.height
+        out[3] = self.sequence >> 8
+        out[4] = self.sequence & 0xFF
+        self.sequence = (self.sequence + 1) & 0xFFFF
+
+        size = _HEADER_BYTES + pack_bits(frame, self._previous, len(frame),
+                                         memoryview(out)[_HEADER_BYTES:], delta)
+        if with_text:
+            out[size:size + len(text)] = text
+            size += len(text)
+
+        self._previous[:] = frame
+        self._previous_text = bytes(text)
+        return memoryview(out)[:size]
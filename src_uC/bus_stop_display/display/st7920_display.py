@@ -18,6 +18,11 @@ from machine import Pin
 from micropython import const
 from framebuf import FrameBuffer, MONO_HLSB
 
+try:
+    # the background transmitter runs on the second core when available
+    import _thread
+except ImportError:
+    _thread = None
 
 
 try:
@@ -33,6 +38,11 @@ _ADDRESS_COUNTER_HOME = const(0x02)
 _ENTRY_MODE = const(0x04)
 _DISPLAY_CONTROL = const(0x08)
 
+# each row of the display is 128 pixels, i.e. 16 bytes in the frame buffer.
+# The GDRAM horizontal address counts in 16-bit words, so 8 words per row.
+_ROW_BYTES = const(16)
+_ROW_WORDS = const(8)
+
 
 @micropython.native
 def encode_for_spi_tx(input_buf: memoryview, output_buf: memoryview):
@@ -44,6 +54,128 @@ def encode_for_spi_tx(input_buf: memoryview, output_buf: memoryview):
         output_buf[(2 * i) + 1] = (byte & 0x0F) << 4
 
 
+# every SPI transfer starts with a synchronising byte, selecting
+# either the instruction register or the data register.
+_SYNC_INSTRUCTION = const(0b11111000)
+_SYNC_DATA = const(0b11111010)
+
+# each row in the frame template is an address instruction (sync byte plus
+# two instruction bytes split into nibbles), a data sync byte, and 16 data
+# bytes split into nibbles.
+_TEMPLATE_HEADER_BYTES = const(6)
+_TEMPLATE_ROW_BYTES = const(_TEMPLATE_HEADER_BYTES + (2 * _ROW_BYTES))
+
+# when more rows than this have changed, it's quicker to send the
+# full frame template than to pack the changed spans.
+_MAX_DIFF_ROWS = const(32)
+
+# the most views of the spi buffer kept for sending its first bytes. A
+# slice of a memoryview is a new object, and animations send the same few
+# lengths on every step.
+_MAX_SPI_VIEWS = const(16)
+
+# The text display RAM (DDRAM) holds 4 rows of 16 half-width characters
+# from the built-in character generator ROM, each 8x16 pixels, which are
+# shown combined with the graphics. The DDRAM address counts in 16-bit
+# words, i.e. 2 characters, and the rows are interleaved in memory.
+TEXT_ROWS = const(4)
+TEXT_COLUMNS = const(16)
+TEXT_CHAR_WIDTH = const(8)
+TEXT_CHAR_HEIGHT = const(16)
+_TEXT_ROW_ADDRESS = b'\x00\x10\x08\x18'
+_SET_DDRAM_ADDRESS = const(0x80)
+
+
+def build_frame_template(height: int) -> memoryview:
+    """Lay out the SPI transmission buffer for a full frame. The address
+    instructions for each row never change, so they're written once here,
+    and only the data nibbles need to be rewritten per frame."""
+
+    template = memoryview(bytearray(height * _TEMPLATE_ROW_BYTES))
+    for row in range(height):
+        vertical = 0x80 | (row & 0x1F)
+        horizontal = 0x80 | (_ROW_WORDS * (row >> 5))
+
+        offset = row * _TEMPLATE_ROW_BYTES
+        template[offset] = _SYNC_INSTRUCTION
+        template[offset + 1] = vertical & 0xF0
+        template[offset + 2] = (vertical & 0x0F) << 4
+        template[offset + 3] = horizontal & 0xF0
+        template[offset + 4] = (horizontal & 0x0F) << 4
+        template[offset + 5] = _SYNC_DATA
+
+    return template
+
+
+@micropython.viper
+def encode_frame(frame: ptr8, template: ptr8, shadow: ptr8, height: int):
+    """Rewrite the data nibbles of the frame template from the frame, and
+    copy the frame into the shadow buffer."""
+
+    for row in range(height):
+        src = row * _ROW_BYTES
+        dst = (row * _TEMPLATE_ROW_BYTES) + _TEMPLATE_HEADER_BYTES
+        for k in range(src, src + _ROW_BYTES):
+            byte = frame[k]
+            template[dst] = byte & 0xF0
+            template[dst + 1] = (byte << 4) & 0xF0
+            shadow[k] = byte
+            dst += 2
+
+
+@micropython.viper
+def pack_changed_spans(frame: ptr8, shadow: ptr8, out: ptr8, first_row: int,
+                       last_row: int, max_rows: int) -> int:
+    """Compare the rows from first_row up to (not including) last_row of the
+    frame against the shadow copy of the last transmitted frame, and pack an
+    address instruction plus the data for the span of changed 16-bit words
+    of each row into `out`, updating the shadow as it goes. The result is
+    packed as (rows << 16) | byte_count, or -1 if more than `max_rows` rows
+    changed."""
+
+    n = 0
+    rows = 0
+    for row in range(first_row, last_row):
+        start = row * _ROW_BYTES
+        first = _ROW_BYTES
+        last = 0
+        i = 0
+        while i < _ROW_BYTES:
+            j = start + i
+            if frame[j] != shadow[j] or frame[j + 1] != shadow[j + 1]:
+                if first == _ROW_BYTES:
+                    first = i
+                last = i + 2
+            i += 2
+
+        if last == 0:
+            continue
+
+        rows += 1
+        if rows > max_rows:
+            return -1
+
+        # the horizontal address counts in words, so the span can start mid-row
+        vertical = 0x80 | (row & 0x1F)
+        horizontal = 0x80 | ((_ROW_WORDS * (row >> 5)) + (first >> 1))
+        out[n] = _SYNC_INSTRUCTION
+        out[n + 1] = vertical & 0xF0
+        out[n + 2] = (vertical << 4) & 0xF0
+        out[n + 3] = horizontal & 0xF0
+        out[n + 4] = (horizontal << 4) & 0xF0
+        out[n + 5] = _SYNC_DATA
+        n += _TEMPLATE_HEADER_BYTES
+
+        for k in range(start + first, start + last):
+            byte = frame[k]
+            out[n] = byte & 0xF0
+            out[n + 1] = (byte << 4) & 0xF0
+            shadow[k] = byte
+            n += 2
+
+    return (rows << 16) | n
+
+
 class ST7920(FrameBuffer):
     """Base class for SSD1306 display driver"""
 
@@ -61,11 +193,44 @@ class ST7920(FrameBuffer):
         # the spi buffer needs to be double the size of frame buffer because
         # each bytes is encoded as 2 bytes, plus 1 header byte.
         self.spi_buffer = memoryview(bytearray((2 * frame_buffer_size) + 1))
+        self._spi_payload = self.spi_buffer[1:]
+        self._spi_views = {}
+
+        # the full frame is sent from a preallocated template, with the
+        # row addresses already in place, so show() doesn't allocate.
+        self.frame_template = build_frame_template(height)
 
         # this instruction scratch register will hold the instruction
         # bytes before being formatted for transmission.
         self.instruction_scratch = memoryview(bytearray(2))
 
+        # a copy of the frame as it was last transmitted to the display,
+        # used to only send the rows that have changed since the last frame.
+        # It's invalid until the first full frame has been sent.
+        self.shadow = memoryview(bytearray(frame_buffer_size))
+        self._shadow_valid = False
+
+        # statistics for the last transmitted frame
+        self.rows_sent = 0
+        self.bytes_sent = 0
+
+        # a copy of the characters last written to the text display RAM,
+        # so only the changed characters are sent.
+        self.text_shadow = memoryview(bytearray(b' ' * (TEXT_ROWS * TEXT_COLUMNS)))
+        self.text_bytes_total = 0
+
+        # when double buffered, the finished frame is copied to the back
+        # buffer and transmitted by a background thread, while the next
+        # frame is drawn into the frame buffer.
+        self.double_buffered = False
+        self._back_buffer = None
+        self._back_full = False
+        self._back_first_row = 0
+        self._back_last_row = height
+        self._tx_start = None
+        self._tx_idle = None
+        self._tx_error = None
+
         super().__init__(memoryview(self.framebuf),
                          width, height, MONO_HLSB)
 
@@ -116,6 +281,17 @@ class ST7920(FrameBuffer):
         finally:
             self.chip_select.value(0)
 
+    def _write_spi_buffer(self, length: int):
+        """Write the first length bytes of the SPI buffer to the SPI
+        device, from a view kept for that length."""
+
+        view = self._spi_views.get(length)
+        if view is None:
+            if len(self._spi_views) >= _MAX_SPI_VIEWS:
+                self._spi_views.clear()
+            view = self._spi_views[length] = self.spi_buffer[:length]
+        self._write_buffer(view)
+
     def write(self, RS, RW, command: Union[int, List[int], memoryview]):
         """Write an arbitrary command to the display."""
 
@@ -144,20 +320,20 @@ class ST7920(FrameBuffer):
 
         if isinstance(command, int):
             self.instruction_scratch[0] = command
-            encode_for_spi_tx(self.instruction_scratch[:1], self.spi_buffer[1:])
-            self._write_buffer(self.spi_buffer[:3])
+            encode_for_spi_tx(self.instruction_scratch[:1], self._spi_payload)
+            self._write_spi_buffer(3)
 
         elif isinstance(command, list):
             size = len(command)
             #print(f'got list of bytes: {command}')
             self.instruction_scratch[:] = bytes(command)
-            encode_for_spi_tx(self.instruction_scratch[:size], self.spi_buffer[1:])
-            self._write_buffer(self.spi_buffer[:1 + (2 * size)])
+            encode_for_spi_tx(self.instruction_scratch[:size], self._spi_payload)
+            self._write_spi_buffer(1 + (2 * size))
 
         else:     # this is a memory view
             size = len(command)
-            encode_for_spi_tx(command, self.spi_buffer[1:])
-            self._write_buffer(self.spi_buffer[:1 + (2 * size)])
+            encode_for_spi_tx(command, self._spi_payload)
+            self._write_spi_buffer(1 + (2 * size))
 
     def write_instruction_register(self, instruction: Union[int, List[int]]):
         """Write the given instruction to the display"""
@@ -236,11 +412,159 @@ class ST7920(FrameBuffer):
     def clear_display(self):
         """Send the command to clear the display."""
 
+        self.flush()
         self.clear_framebuffer()
         self.write_instruction_register(_DISPLAY_CLEAR)
+        self.invalidate_shadow()
+
+    def clear_text(self):
+        """Fill the text display RAM with spaces."""
+
+        self.text_shadow[:] = b' ' * len(self.text_shadow)
+        for row in range(TEXT_ROWS):
+            self._write_text_span(row, 0, TEXT_COLUMNS)
+
+    def write_text(self, row: int, column: int, text: str) -> None:
+        """Write the text into the text display RAM, at the given row and
+        column of the 16x4 character grid. Only the characters that differ
+        from the last write are sent. Text beyond the end of the row is
+        dropped."""
+
+        text = text[:TEXT_COLUMNS - column]
+        start = (row * TEXT_COLUMNS) + column
+
+        # find the first and last characters that changed
+        first, last = -1, -1
+        for i, ch in enumerate(text):
+            if self.text_shadow[start + i] != ord(ch):
+                self.text_shadow[start + i] = ord(ch)
+                if first < 0:
+                    first = column + i
+                last = column + i + 1
+
+        if first >= 0:
+            self._write_text_span(row, first, last)
+
+    def _write_text_span(self, row: int, first: int, last: int):
+        """Send the characters of the given row from the text shadow,
+        widened to whole words, since the address counts in words."""
+
+        first &= ~1
+        last = (last + 1) & ~1
+        offset = row * TEXT_COLUMNS
+
+        # the DDRAM address can only be set in the basic instruction set
+        self.flush()
+        self.configure_op_modes(eight_bit=1, extended_instr=0, graphic=0)
+        self.write_instruction_register(_SET_DDRAM_ADDRESS |
+                                        (_TEXT_ROW_ADDRESS[row] + (first >> 1)))
+        self.write_data_register(self.text_shadow[offset + first:offset + last])
+
+        # RE and G can't be changed at the same time, per the datasheet
+        self.configure_op_modes(eight_bit=1, extended_instr=1, graphic=0)
+        self.configure_op_modes(eight_bit=1, extended_instr=1, graphic=1)
 
-    def show(self) -> None:
-        """Write the full frame buffer to the device."""
+        # 3 bytes for each of the 4 instructions, plus the data
+        self.text_bytes_total += (4 * 3) + 1 + (2 * (last - first))
+
+    def invalidate_shadow(self):
+        """Force the next call to show() to send the full frame, used when
+        the display RAM may no longer match what was last sent."""
+        self.flush()
+        self._shadow_valid = False
+
+    def start_background_transmitter(self) -> bool:
+        """Switch to double buffered mode, where frames are transmitted
+        by a background thread. Returns False, staying synchronous, if
+        threads aren't supported on this port."""
+
+        if self.double_buffered:
+            return True
+        if _thread is None:
+            return False
+
+        self._back_buffer = memoryview(bytearray(len(self.framebuf)))
+
+        # _tx_start is released to hand a frame to the transmitter, and
+        # _tx_idle is held for as long as a frame is being transmitted.
+        self._tx_start = _thread.allocate_lock()
+        self._tx_idle = _thread.allocate_lock()
+        self._tx_start.acquire()
+
+        try:
+            _thread.start_new_thread(self._transmitter_loop, ())
+        except Exception:
+            self._back_buffer = None
+            return False
+
+        self.double_buffered = True
+        return True
+
+    def _transmitter_loop(self):
+        """Background thread, transmitting each frame as it's handed over."""
+
+        while True:
+            self._tx_start.acquire()
+            try:
+                self._transmit(self._back_buffer, self._back_full,
+                               self._back_first_row, self._back_last_row)
+            except Exception as exc:
+                # re-raised by the next call to show() or flush()
+                self._tx_error = exc
+            finally:
+                self._tx_idle.release()
+
+    def flush(self) -> None:
+        """Block until the frame being transmitted in the background has
+        been sent. Must be called before any other writes to the display."""
+
+        if self.double_buffered:
+            self._tx_idle.acquire()
+            self._tx_idle.release()
+            self._raise_tx_error()
+
+    def _raise_tx_error(self):
+        if self._tx_error is not None:
+            exc, self._tx_error = self._tx_error, None
+            raise exc
+
+    def show(self, full: bool = False, first_row: int = 0,
+             last_row: Optional[int] = None) -> None:
+        """Write the frame buffer to the device. Only the 16-bit word spans
+        of each row that changed since the last frame are sent, unless
+        `full` is set, or the display contents are unknown. If the caller
+        knows which rows were drawn, only rows from `first_row` up to (not
+        including) `last_row` are compared.
+
+        When double buffered, this only waits for the previous frame to
+        finish transmitting, and hands over a copy of the current frame."""
+
+        if last_row is None:
+            last_row = self.height
+
+        if not self.double_buffered:
+            self._transmit(self.framebuf, full, first_row, last_row)
+            return
+
+        # the back buffer is only touched by the transmitter while _tx_idle
+        # is held, so once it's acquired here the flip can't race.
+        self._tx_idle.acquire()
+        try:
+            self._raise_tx_error()
+            self._back_buffer[:] = self.framebuf
+            self._back_full = full
+            self._back_first_row = first_row
+            self._back_last_row = last_row
+        except Exception:
+            self._tx_idle.release()
+            raise
+
+        self._tx_start.release()
+
+    def _transmit(self, frame: memoryview, full: bool,
+                  first_row: int, last_row: int) -> None:
+        """Write the given frame to the device, only comparing the given
+        rows against the shadow, unless sending the full frame."""
 
         # The frame buffer doesn't map directly to display RAM on the
         # LCD. The LCD ram is laid out as 256x32 even though the display
@@ -255,9 +579,30 @@ class ST7920(FrameBuffer):
         #
         # Therefore changing the layout of the framebuffer won't allow the
         # data to be sent in one large block because the vertical address doesn't
-        # increment.
-        #
+        # increment. Instead, every row is sent as an address instruction
+        # followed by its data, all packed into one buffer, so the whole
+        # frame goes out in a single SPI write.
 
-        for line_index in range(self.height):
-            self.set_display_address(line_index & 0x1F, 8 * (line_index >> 5))
-            self.write_data_register(self.framebuf[line_index * 16:(line_index * 16) + 16])
+        try:
+            if not full and self._shadow_valid:
+                packed = pack_changed_spans(frame, self.shadow, self.spi_buffer,
+                                            first_row, last_row, _MAX_DIFF_ROWS)
+                if packed >= 0:
+                    byte_count = packed & 0xFFFF
+                    if byte_count:
+                        self._write_spi_buffer(byte_count)
+
+                    self.rows_sent = packed >> 16
+                    self.bytes_sent = byte_count
+                    return
+
+            encode_frame(frame, self.frame_template, self.shadow, self.height)
+            self._write_buffer(self.frame_template)
+        except Exception:
+            # the shadow was updated before sending, so it can't be trusted
+            self._shadow_valid = False
+            raise
+
+        self._shadow_valid = True
+        self.rows_sent = self.height
+        self.bytes_sent = len(self.frame_template)
@@ -0,0 +1,98 @@
+"""
+`text_cache`
+====================================================
+
+A cache of strings rendered into small MONO_HLSB frame buffers,
+so text that's unchanged between frames is blitted rather than
+being rasterised again.
+
+* Author: Kevin O'Connell
+
+"""
+
+from micropython import const
+from framebuf import FrameBuffer, MONO_HLSB
+
+from .lru_cache import LRUCache
+
+
+# a rough allowance for the frame buffer, bytearray and key
+# objects held for each cached strip, on top of the pixel data.
+_STRIP_OVERHEAD_BYTES = const(64)
+
+
+class MicroFontRenderer:
+    """Adapt a MicroFont to the interface used by the strip cache."""
+
+    def __init__(self, font, x_spacing: int = 0):
+        self.font = font
+        self.x_spacing = x_spacing
+
+    def strip_size(self, string: str):
+        """Return the (width, height) in pixels of the rendered string."""
+
+        width = 0
+        for ch in string:
+            width += self.font.get_ch(ch)[2] + self.x_spacing
+        return max(width - self.x_spacing, 0), self.font.height
+
+    def render_strip(self, fb: FrameBuffer, string: str, colour: int):
+        """Render the string at the top left of the frame buffer."""
+        self.font.write(string, fb, MONO_HLSB, fb.width, fb.height,
+                        0, 0, colour, x_spacing=self.x_spacing)
+
+
+class TextStrip(FrameBuffer):
+    """A frame buffer holding a single rendered string."""
+
+    def __init__(self, width: int, height: int):
+        # MicroFont assumes the frame buffer width is a whole number of
+        # bytes, the padding is the background colour so it's invisible.
+        width = (width + 7) & ~7
+        self.buffer = bytearray((width // 8) * height)
+        self.width = width
+        self.height = height
+        super().__init__(self.buffer, width, height, MONO_HLSB)
+
+
+class TextStripCache:
+    """Draw strings through an LRU cache of pre-rendered strips, keyed by
+    font, text and colour, bounded to a fixed number of bytes. Fonts must
+    provide strip_size(string) and render_strip(fb, string, colour)."""
+
+    def __init__(self, budget: int):
+        self._cache = LRUCache(budget)
+
+    @property
+    def hits(self):
+        return self._cache.hits
+
+    @property
+    def misses(self):
+        return self._cache.misses
+
+    @property
+    def used_bytes(self):
+        return self._cache.used
+
+    def strip(self, font, string: str, colour: int) -> TextStrip:
+        """Return the rendered strip for the string, rendering it on a miss.
+        The strip background is the opposite of the text colour."""
+
+        key = (font, string, colour)
+        strip = self._cache.get(key)
+        if strip is None:
+            width, height = font.strip_size(string)
+            strip = TextStrip(width, height)
+            strip.fill(1 - colour)
+            font.render_strip(strip, string, colour)
+            self._cache.put(key, strip, len(strip.buffer) + _STRIP_OVERHEAD_BYTES)
+
+        return strip
+
+    def draw(self, fb: FrameBuffer, font, string: str, x: int, y: int, colour: int):
+        """Draw the string into the frame buffer, leaving the background
+        around the glyphs untouched."""
+
+        if string:
+            fb.blit(self.strip(font, string, colour), x, y, 1 - colour)
@@ -0,0 +1,485 @@
+"""
+`http_client`
+====================================================
+
+A small HTTP/1.1 client for asyncio, that keeps its connection to
+the server open between requests, so successive requests to the
+backend don't each pay for DNS, TCP and a TLS handshake. Each client
+has one connection, so with a client each, several requests can be
+waiting on the server at once. Response bodies are read with
+readinto, into buffers owned by the caller.
+
+ValidatorCache makes requests conditional, so the server can answer
+with a bodiless 304 when nothing has changed since the last one.
+
+If the firmware has the `deflate` module, gzip and deflate responses
+are accepted, and decompressed as they're read with body_reader().
+
+This module doesn't import anything from the package, so the
+benchmarks can use it on the MicroPython unix port.
+
+* Author: Kevin O'Connell
+
+"""
+
+import io
+import asyncio
+
+try:
+    import ssl
+except ImportError:
+    ssl = None
+
+try:
+    import deflate
+except ImportError:
+    deflate = None
+
+from micropython import const
+
+
+_HTTP_PORT = const(80)
+_HTTPS_PORT = const(443)
+
+# used to discard the rest of a body that isn't wanted
+_DRAIN_BUFFER_BYTES = const(256)
+
+# the number of urls whose validators are kept
+_VALIDATOR_CACHE_URLS = const(16)
+
+# the content encodings that can be decompressed, HTTP's "deflate" is
+# the zlib format. Decompressing needs a window of up to 32 KB.
+_DEFLATE_FORMATS = {} if deflate is None else {'gzip': deflate.GZIP, 'deflate': deflate.ZLIB}
+
+# a compressed body is read into a fixed buffer as it arrives. The deflate
+# module can't wait for more, so it's only run while enough is buffered for
+# two block headers, and the input of a chunk of output, or once the whole
+# body is in.
+_INFLATE_BUFFER_BYTES = const(2048)
+_INFLATE_MARGIN_BYTES = const(1536)
+_INFLATE_CHUNK_BYTES = const(128)
+
+
+class HTTPError(OSError):
+    """The server responded, but not with what was asked for."""
+
+
+class ConnectionClosed(OSError):
+    """The server closed the connection before the response was complete."""
+
+
+def split_url(url: str):
+    """Split the url into (scheme, host, port, path)."""
+
+    scheme, _, rest = url.partition('://')
+    host, slash, path = rest.partition('/')
+    path = slash + path if slash else '/'
+
+    port = _HTTPS_PORT if scheme == 'https' else _HTTP_PORT
+    if ':' in host:
+        host, port = host.split(':', 1)
+        port = int(port)
+
+    return scheme, host, port, path
+
+
+def _ssl_context():
+    """The TLS context for connections to the backend, which isn't
+    verified, since the Pico W has no CA bundle."""
+
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    if hasattr(context, 'check_hostname'):
+        context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def _request_bytes(host: str, path: str, keep_alive: bool, headers: dict) -> bytes:
+    connection = 'keep-alive' if keep_alive else 'close'
+    request = f'GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: {connection}\r\n'
+    if headers:
+        for name, value in headers.items():
+            request += f'{name}: {value}\r\n'
+    return (request + '\r\n').encode()
+
+
+def accept_encoding(headers: dict) -> dict:
+    """Return the headers, asking for a compressed response if it can be
+    decompressed, otherwise unchanged."""
+
+    if not _DEFLATE_FORMATS:
+        return headers
+
+    headers = dict(headers)
+    headers['Accept-Encoding'] = ', '.join(_DEFLATE_FORMATS)
+    return headers
+
+
+class _CompressedBody(io.IOBase):
+    """A ring buffer of the compressed body, filled from the response as
+    it arrives, for the deflate module to read from."""
+
+    def __init__(self, response):
+        self._response = response
+        self._buffer = memoryview(bytearray(_INFLATE_BUFFER_BYTES))
+
+        # the total bytes written and read, the buffer positions are these
+        # modulo its size
+        self._written = 0
+        self._read = 0
+        self.eof = False
+
+    def buffered(self) -> int:
+        return self._written - self._read
+
+    async def fill(self):
+        """Read the next part of the body, into the free space up to the
+        end of the buffer."""
+
+        start = self._written % _INFLATE_BUFFER_BYTES
+        size = min(_INFLATE_BUFFER_BYTES - start, _INFLATE_BUFFER_BYTES - self.buffered())
+        count = await self._response.readinto(self._buffer[start:start + size])
+        if count:
+            self._written += count
+        else:
+            self.eof = True
+
+    def readinto(self, buf) -> int:
+        # called by the deflate module, a byte at a time, returning 0 only
+        # once the buffer is empty, which is the end as far as it knows
+        start = self._read % _INFLATE_BUFFER_BYTES
+        count = min(len(buf), self.buffered(), _INFLATE_BUFFER_BYTES - start)
+        buf[:count] = self._buffer[start:start + count]
+        self._read += count
+        return count
+
+
+class _InflatedBody:
+    """The body of a compressed response, decompressed as it arrives,
+    read the same way as the response itself."""
+
+    def __init__(self, response, format: int):
+        self._source = _CompressedBody(response)
+        self._inflater = deflate.DeflateIO(self._source, format)
+        self._done = False
+
+    async def readinto(self, buf) -> int:
+        """Decompress the next part of the body into buf, returning the
+        number of bytes, or 0 at the end of the body."""
+
+        if self._done:
+            return 0
+
+        source = self._source
+        while not source.eof and source.buffered() < _INFLATE_MARGIN_BYTES:
+            await source.fill()
+
+        try:
+            count = self._inflater.readinto(memoryview(buf)[:_INFLATE_CHUNK_BYTES])
+        except EOFError:
+            raise ValueError('compressed body ended early')
+
+        self._done = not count
+        return count
+
+
+def body_reader(response):
+    """Return an object whose async readinto() reads the body of the
+    response, decompressed as it arrives if it was sent compressed."""
+
+    encoding = response.headers.get('content-encoding', 'identity').lower()
+    if encoding == 'identity':
+        return response
+
+    if encoding not in _DEFLATE_FORMATS:
+        raise HTTPError(f'unsupported content encoding: {encoding}')
+
+    return _InflatedBody(response, _DEFLATE_FORMATS[encoding])
+
+
+class ValidatorCache:
+    """The ETag and Last-Modified validators of the last response from
+    each url, sent back as If-None-Match and If-Modified-Since on the
+    next request to it. The least recently stored are forgotten first."""
+
+    def __init__(self, size: int = _VALIDATOR_CACHE_URLS):
+        self.size = size
+        self._validators = {}
+        self._order = []
+
+    def headers(self, url: str, headers: dict) -> dict:
+        """Return the headers with the validators for the url added."""
+
+        validators = self._validators.get(url)
+        if validators is None:
+            return headers
+
+        etag, last_modified = validators
+        headers = dict(headers)
+        if etag is not None:
+            headers['If-None-Match'] = etag
+        if last_modified is not None:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def store(self, url: str, response):
+        """Keep the validators of a complete 200 response."""
+
+        etag = response.headers.get('etag')
+        last_modified = response.headers.get('last-modified')
+        if etag is None and last_modified is None:
+            self.forget(url)
+            return
+
+        if url in self._validators:
+            self._order.remove(url)
+        elif len(self._order) >= self.size:
+            del self._validators[self._order.pop(0)]
+
+        self._validators[url] = (etag, last_modified)
+        self._order.append(url)
+
+    def forget(self, url: str):
+        if url in self._validators:
+            del self._validators[url]
+            self._order.remove(url)
+
+
+class AsyncHTTPResponse:
+    """The status and headers of a response, with the body read from the
+    connection as it's asked for. The body must be read to the end, or
+    the response closed, before the connection can be used again."""
+
+    def __init__(self, client):
+        self._client = client
+        self._stream = client._stream
+        client._response = self
+
+        self.status = None
+        self.headers = {}
+
+        # where the body ends, -1 means when the server closes
+        self._keep_alive = client.keep_alive
+        self._chunked = False
+        self._chunk_left = 0
+        self._remaining = -1
+        self.done = False
+
+    def _parse_line(self, line) -> bool:
+        """Parse the status line or a header, returning True once the
+        blank line at the end of the headers is reached."""
+
+        if not line:
+            raise ConnectionClosed('connection closed by the server')
+
+        if self.status is None:
+            # i.e. "HTTP/1.1 200 OK", the reason is optional
+            parts = line.split(None, 2)
+            if len(parts) < 2 or not parts[0].startswith(b'HTTP/') or not parts[1].isdigit():
+                raise HTTPError(f'malformed status line: {line[:32]}')
+            self.status = int(parts[1])
+            return False
+        if line == b'\r\n' or line == b'\n':
+            self._frame_body()
+            return True
+
+        if b':' not in line:
+            raise HTTPError(f'malformed header: {line[:32]}')
+        name, value = line.split(b':', 1)
+        self.headers[name.strip().lower().decode()] = value.strip().decode()
+        return False
+
+    def _frame_body(self):
+        self._keep_alive = (self._keep_alive and
+                            self.headers.get('connection', '').lower() != 'close')
+
+        if self.status in (204, 304) or self.status < 200:
+            self._remaining = 0
+        elif self.headers.get('transfer-encoding', '').lower() == 'chunked':
+            self._chunked = True
+        elif 'content-length' in self.headers:
+            self._remaining = int(self.headers['content-length'])
+        else:
+            self._keep_alive = False
+
+        if self._remaining == 0:
+            self._finish()
+
+    def _finish(self):
+        self.done = True
+        self._client._response_finished(self, self._keep_alive)
+
+    def _start_chunk(self, line) -> bool:
+        """Parse a chunk size line, returning False for the last chunk."""
+
+        self._chunk_left = int(line.split(b';', 1)[0], 16)
+        return self._chunk_left > 0
+
+    def _chunk_read(self, count: int) -> bool:
+        """Account for count bytes read from a chunk, returning True
+        if the end of the chunk was reached."""
+
+        if not count:
+            raise ConnectionClosed('connection closed mid-chunk')
+        self._chunk_left -= count
+        return self._chunk_left == 0
+
+    def _body_read(self, count: int):
+        """Account for count bytes read from a Content-Length body."""
+
+        if not count:
+            raise ConnectionClosed('connection closed mid-body')
+        self._remaining -= count
+        if self._remaining == 0:
+            self._finish()
+
+    def _check_status(self):
+        if self.status not in (200, 304):
+            raise HTTPError(f'HTTP status {self.status}')
+
+    async def _read_headers(self):
+        while not self._parse_line(await self._stream.readline()):
+            pass
+
+    async def readinto(self, buf) -> int:
+        """Read the next part of the body into buf, returning the number
+        of bytes read, or 0 at the end of the body."""
+
+        if self.done:
+            return 0
+
+        try:
+            return await self._readinto(memoryview(buf))
+        except BaseException:
+            # including being cancelled by a timeout, the connection is
+            # in an unknown state, so it can't be reused
+            self.done = True
+            self._client.close()
+            raise
+
+    async def _readinto(self, buf) -> int:
+        stream = self._stream
+
+        if self._chunked:
+            if self._chunk_left == 0:
+                if not self._start_chunk(await stream.readline()):
+                    # skip any trailers, up to the blank line
+                    while await stream.readline() not in (b'\r\n', b'\n', b''):
+                        pass
+                    self._finish()
+                    return 0
+
+            count = await stream.readinto(buf[:min(len(buf), self._chunk_left)])
+            if self._chunk_read(count):
+                await stream.readline()
+            return count
+
+        if self._remaining < 0:
+            count = await stream.readinto(buf)
+            if not count:
+                self._finish()
+            return count
+
+        count = await stream.readinto(buf[:min(len(buf), self._remaining)])
+        self._body_read(count)
+        return count
+
+    async def close(self):
+        """Discard the rest of the body, so the connection can be reused."""
+
+        while not self.done:
+            await self.readinto(self._client._drain)
+
+
+class AsyncHTTPClient:
+    """Send GET requests over one connection, kept open between requests
+    to the same host. If the server has closed the connection while it
+    was idle, the request is sent again over a new connection. Each
+    concurrent request needs its own client."""
+
+    def __init__(self, timeout: int = 10, keep_alive: bool = True):
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+
+        self._stream = None
+        self._writer = None
+        self._target = None
+        self._response = None
+
+        self._drain = bytearray(_DRAIN_BUFFER_BYTES)
+
+        self.requests = 0
+        self.connections = 0
+
+    async def _connect(self):
+        scheme, host, port = self._target
+        context = _ssl_context() if scheme == 'https' else None
+
+        self._stream, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=context), self.timeout)
+        self.connections += 1
+
+    def close(self):
+        """Close the connection, if it's open."""
+
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except OSError:
+                pass
+
+        self._stream = None
+        self._writer = None
+        self._response = None
+
+    def _response_finished(self, response: AsyncHTTPResponse, keep_alive: bool):
+        if response is self._response:
+            self._response = None
+            if not keep_alive:
+                self.close()
+
+    async def get(self, url: str, headers: dict = None) -> AsyncHTTPResponse:
+        """Send a GET request, returning the response once the status and
+        headers are received. Raises HTTPError for any status other than
+        200, or 304, which is returned for the caller to handle."""
+
+        scheme, host, port, path = split_url(url)
+        if (scheme, host, port) != self._target:
+            self.close()
+            self._target = (scheme, host, port)
+
+        if self._response is not None:
+            await self._response.close()
+
+        request = _request_bytes(host, path, self.keep_alive, headers)
+
+        for attempt in range(2):
+            reused = self._stream is not None
+            if not reused:
+                await self._connect()
+
+            try:
+                self._writer.write(request)
+                await self._writer.drain()
+                response = AsyncHTTPResponse(self)
+                await response._read_headers()
+            except HTTPError:
+                # the server answered, but not with valid HTTP, so don't resend
+                self.close()
+                raise
+            except OSError:
+                self.close()
+                if reused:
+                    # the server closed the idle connection, try a new one
+                    continue
+                raise
+            break
+
+        self.requests += 1
+
+        try:
+            response._check_status()
+        except HTTPError:
+            await response.close()
+            raise
+        return response
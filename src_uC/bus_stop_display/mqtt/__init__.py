@@ -1,3 +1,4 @@
 
 from .simple import MQTTClient, MQTTException
 from .controller import MQTTController, unbundle_certificate_file, unbundle_certificates
+from .screen_mirror import ScreenMirror
@@ -95,6 +95,9 @@ class MQTTController(MQTTClient):
 
         self._root_topic = None
 
+        # maps each full command topic to its handler
+        self._commands = {}
+
         MQTTClient.__init__(self, client_id or _client_id(),
                             mqtt_server, port=port,
                             user=user, password=password,
@@ -133,3 +136,18 @@ class MQTTController(MQTTClient):
     def publish(self, topic, msg, retain=False, qos=0):
         super().publish(self._root_topic + topic,
                         msg, retain=retain, qos=qos)
+
+    def add_command(self, topic, handler):
+        """Subscribe to the topic, under the root topic, calling the handler
+        with the message each time one is published to it. Messages are only
+        received when `check_msg()` is called."""
+
+        topic = (self._root_topic + topic).encode()
+        self._commands[topic] = handler
+        self.set_callback(self._dispatch)
+        self.subscribe(topic)
+
+    def _dispatch(self, topic, msg):
+        handler = self._commands.get(topic)
+        if handler is not None:
+            handler(msg)
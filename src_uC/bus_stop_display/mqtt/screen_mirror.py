@@ -0,0 +1,71 @@
+"""
+`screen_mirror`
+====================================================
+
+Publish snapshots of the display over MQTT, so the screen of a
+unit in the field can be seen remotely. A snapshot is sent each
+time one is requested, and optionally streamed whenever the
+screen changes, at a throttled rate.
+
+Use `tools/snapshot_decoder.py` to view them.
+
+* Author: Kevin O'Connell
+
+"""
+
+import time
+
+from ..display.snapshot import SnapshotEncoder
+
+
+SCREEN_TOPIC = '/screen'
+SCREEN_REQUEST_TOPIC = '/screen/get'
+
+
+class ScreenMirror:
+    """Publish snapshots of the display to the screen topic. Publishing
+    anything to the request topic sends a key frame straight away."""
+
+    def __init__(self, mqtt, display, stream_interval_ms: int = 0):
+        self._mqtt = mqtt
+        self._encoder = SnapshotEncoder(display)
+        self.stream_interval_ms = stream_interval_ms
+
+        self._requested = False
+        self._last_publish_ms = time.ticks_ms()
+
+        self.snapshots_sent = 0
+        self.bytes_sent = 0
+
+        mqtt.add_command(SCREEN_REQUEST_TOPIC, self._on_request)
+
+    def _on_request(self, msg):
+        self._requested = True
+        self._encoder.request_key_frame()
+
+    def poll(self):
+        """Check for requests, and publish a snapshot if one was requested,
+        or if streaming, the screen has changed and the interval has passed."""
+
+        self._mqtt.check_msg()
+
+        if not self._requested:
+            if self.stream_interval_ms <= 0:
+                return
+            if time.ticks_diff(time.ticks_ms(), self._last_publish_ms) < self.stream_interval_ms:
+                return
+            if not self._encoder.changed:
+                return
+
+        self.publish()
+
+    def publish(self):
+        """Publish a snapshot of the screen now."""
+
+        snapshot = self._encoder.encode()
+        self._mqtt.publish(SCREEN_TOPIC, snapshot)
+
+        self._requested = False
+        self._last_publish_ms = time.ticks_ms()
+        self.snapshots_sent += 1
+        self.bytes_sent += len(snapshot)
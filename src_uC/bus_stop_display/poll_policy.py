@@ -0,0 +1,43 @@
+"""
+`poll_policy`
+====================================================
+
+Decide how long to wait before polling the backend for a stop
+again, from how soon its next departure is. Arrival predictions
+only change quickly for buses that are close, so those stops are
+polled at the fastest rate, and stops with nothing due for a
+while, or no service at all, back off towards the slowest.
+
+This module doesn't import anything from the package, so the
+tools can use it to model the number of requests made.
+
+* Author: Kevin O'Connell
+
+"""
+
+from micropython import const
+
+
+# the default bounds on the interval between polls of a stop
+POLL_INTERVAL_MIN_SECS = const(5)
+POLL_INTERVAL_MAX_SECS = const(120)
+
+# departures within this many seconds are polled at the fastest rate
+_NEAR_DEPARTURE_SECS = const(300)
+
+# further out, the stop is polled this many times, at most, before
+# the next departure, i.e. 20 minutes away is polled every 2.5 minutes
+_POLLS_BEFORE_DEPARTURE = const(8)
+
+
+def next_poll_secs(soonest_secs, min_secs: int = POLL_INTERVAL_MIN_SECS,
+                   max_secs: int = POLL_INTERVAL_MAX_SECS) -> int:
+    """Return the seconds until a stop should next be polled, given the
+    seconds until its soonest departure, or None if there are none."""
+
+    if soonest_secs is None:
+        return max_secs
+    if soonest_secs <= _NEAR_DEPARTURE_SECS:
+        return min_secs
+
+    return max(min_secs, min(max_secs, int(soonest_secs) // _POLLS_BEFORE_DEPARTURE))
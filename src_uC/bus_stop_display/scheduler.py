@@ -0,0 +1,100 @@
+"""
+`scheduler`
+====================================================
+
+A deadline based scheduler for the main loop. Each task is
+run when it falls due, and returns how long until it should
+run again. In between, the scheduler sleeps.
+
+* Author: Kevin O'Connell
+
+"""
+
+import time
+from micropython import const
+
+
+# the longest the scheduler sleeps in one go, so it picks up tasks
+# triggered while it sleeps, e.g. by a button press.
+_MAX_SLEEP_SLICE_MS = const(50)
+
+
+class Task:
+    """A named callback, and the ticks_ms() deadline it's next due at.
+    The callback returns the delay in ms until it should next run, or
+    None to leave it unscheduled until it's triggered."""
+
+    def __init__(self, name: str, callback):
+        self.name = name
+        self.callback = callback
+        self.due = None
+        self.runs = 0
+
+
+class Scheduler:
+    """Run tasks at their deadlines, in the order they were added when
+    more than one is due."""
+
+    def __init__(self):
+        self._tasks = []
+
+    def add(self, name: str, callback, delay_ms: int = 0) -> Task:
+        """Add a task, first due after the given delay."""
+
+        task = Task(name, callback)
+        self._tasks.append(task)
+        self.schedule(task, delay_ms)
+        return task
+
+    def schedule(self, task: Task, delay_ms: int):
+        """Set the task to run after delay_ms from now."""
+        task.due = time.ticks_add(time.ticks_ms(), delay_ms)
+
+    def schedule_no_later_than(self, task: Task, delay_ms: int):
+        """Bring the task forward to run after delay_ms, unless it's
+        already due before then."""
+
+        due = time.ticks_add(time.ticks_ms(), delay_ms)
+        if task.due is None or time.ticks_diff(due, task.due) < 0:
+            task.due = due
+
+    def trigger(self, task: Task):
+        """Run the task as soon as possible."""
+        self.schedule_no_later_than(task, 0)
+
+    def _next_task(self):
+        """Return the task with the earliest deadline."""
+
+        next_task = None
+        for task in self._tasks:
+            if task.due is None:
+                continue
+            if next_task is None or time.ticks_diff(task.due, next_task.due) < 0:
+                next_task = task
+        return next_task
+
+    def run_once(self):
+        """Run the next task if it's due, otherwise sleep for up to
+        one sleep slice."""
+
+        task = self._next_task()
+        if task is None:
+            wait_ms = _MAX_SLEEP_SLICE_MS
+        else:
+            wait_ms = time.ticks_diff(task.due, time.ticks_ms())
+
+        if wait_ms > 0:
+            time.sleep_ms(min(wait_ms, _MAX_SLEEP_SLICE_MS))
+            return
+
+        task.due = None
+        task.runs += 1
+        delay_ms = task.callback()
+
+        # the callback may have rescheduled the task itself
+        if delay_ms is not None and task.due is None:
+            self.schedule(task, delay_ms)
+
+    def run_forever(self):
+        while True:
+            self.run_once()
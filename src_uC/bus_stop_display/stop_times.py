@@ -1,65 +1,33 @@
-
-import gc
 import time
-import ujson as json
-import urequests as requests
+import asyncio
+
 
+from micropython import const
 
 from . import log
 from . import ConfigImportMixin
+from .http_client import AsyncHTTPClient
+from .arrivals_fetch import read_stops_times, batch_url, NOT_MODIFIED
+from .poll_policy import next_poll_secs, POLL_INTERVAL_MIN_SECS, POLL_INTERVAL_MAX_SECS
+from .backend_health import BACKEND_HEALTH
 
 from .time_tools import now_epoch, timestamp_to_epoch
 
 
-# pre-allocate a response buffer for the data, so there's always enough
-# memory for the response.
-_RESPONSE_BUFFER = bytearray(4096)
-
-
-def retry_on_error(retry_count, cooldown=15):
-    """Return the get_stop_times() function if an exception is thrown
-    or the bus-stop times were not returned in the request."""
-
-    def _decorator(func):
-        def _wrapper(*args, **kwargs):
-            for i in range(retry_count + 1):
-                try:
-                    stop_name, arrivals = func(*args, **kwargs)
-                except OSError as exc:
-                    log.error('Exception during bus-stop update:', exc=exc)
-                else:
-                    if stop_name is not None:
-                        return stop_name, arrivals
-                    else:
-                        log.error('Bus stop update response didn\'t include any data')
-                        time.sleep(cooldown)
-            else:
-                # all retries failed
-                return None, None
-
-        return _wrapper
-    return _decorator
-
+# the most stop IDs asked for in one request, to bound the response size
+_MAX_STOPS_PER_REQUEST = const(8)
 
-@retry_on_error(retry_count=2, cooldown=5)
-def get_stop_times(stop_id, url):
-    """Request the latest stop times for the given stop_id."""
+# the most connections to the backend open at once, when fetching
+# concurrently. Each TLS connection needs its own socket, and tens
+# of KB of heap for mbedTLS, so the Pico W can only afford a few.
+MAX_CONNECTIONS = const(2)
 
-    # we must garbage collect before attempting a web request to make sure
-    # there's enough memory to parse all of the data.
-    gc.collect()
+# arrivals are dropped from the board this long after they're due, in
+# case the backend can't be reached to say they've gone
+_DEPARTED_SECS = const(60)
 
-    r = requests.get(url.format(stop_id),
-                     headers={'Accept': 'application/json'})
-    byte_count = r.raw.readinto(_RESPONSE_BUFFER)
-    all_stops = json.loads(_RESPONSE_BUFFER[:byte_count])
-
-    stop_str = str(stop_id)
-    if stop_str not in all_stops:
-        return None, None
-    else:
-        stop_data = all_stops[stop_str]
-        return stop_data['stop_name'], stop_data['arrivals']
+# how often an idle worker checks for requests added by the others
+_IDLE_WORKER_SECS = 0.05
 
 
 def _is_valid_arrival(arr: dict):
@@ -72,24 +40,22 @@ def _is_valid_arrival(arr: dict):
 
 def prepare_service_arrivals(arrivals, name_subs):
     """This function filters the provided data from the backend,
-    removing known erroneous data from the source."""
-
-    # the GTFS backend provides all times in UTC
-    now = now_epoch(apply_dst_offset=False)
+    removing known erroneous data from the source. The arrival
+    times are converted to epochs once, when the data arrives, so
+    the countdowns can tick locally between polls."""
 
     prepped = []
     for arr in filter(_is_valid_arrival, arrivals):
+        # the GTFS backend provides all times in UTC
         arr_epoch = timestamp_to_epoch(arr['real_time_arrival'])
         is_scheduled = arr['real_time_arrival'] == arr['scheduled_arrival']
 
-        secs = arr_epoch - now
         headsign = name_subs.get(arr['headsign'], arr['headsign'])
 
         prepped.append({'route': arr['route'],
                         'headsign': headsign,
                         'scheduled': is_scheduled,
-                        'minutes': secs // 60,
-                        'seconds': secs})
+                        'epoch': arr_epoch})
 
     return prepped
 
@@ -129,6 +95,13 @@ class BusStop:
         self._name_subs = None
         self._last_good_update = 0
 
+        # when this stop is next due to be polled, as ticks_ms(), None
+        # if it's due now, and the bounds on the interval between polls
+        self._next_poll = None
+        self._last_poll = None
+        self._poll_min_secs = POLL_INTERVAL_MIN_SECS
+        self._poll_max_secs = POLL_INTERVAL_MAX_SECS
+
         self.parse(line)
 
     def parse(self, line: str):
@@ -159,13 +132,39 @@ class BusStop:
         """Set the name substitution dict for destinations."""
         self._name_subs = sub_dict
 
-    def update_times(self):
-        """Update the cache of arrivals for this stop."""
+    def set_poll_interval(self, min_secs, max_secs):
+        """Set the bounds on the interval between polls of this stop."""
+        self._poll_min_secs = min_secs
+        self._poll_max_secs = max_secs
 
+    @property
+    def stop_ids(self):
+        return self._stop_ids
+
+    def set_times(self, times: dict):
+        """Update the cache of arrivals from a dict of stop_id ->
+        (stop_name, arrivals), which may include other stops. Any of
+        this stop's IDs missing from it failed to update, and those with
+        arrivals of NOT_MODIFIED are unchanged since the last update."""
+
+        updated = True
         for stop_id in self._stop_ids:
-            stop_name, arrivals = get_stop_times(stop_id, self._backend_url)
+            stop_name, arrivals = times.get(stop_id, (None, None))
+            if arrivals is NOT_MODIFIED and stop_id not in self._arrival_cache:
+                # there's nothing cached to be unchanged, so it's retried
+                arrivals = None
+            updated = updated and arrivals is not None
             self._name = self._name or stop_name
 
+            if arrivals is NOT_MODIFIED:
+                self._last_good_update = time.time()
+                continue
+
+            # a failed update keeps the cached arrivals, which count down
+            # locally, and are dropped from the board once they've departed.
+            if arrivals is None:
+                continue
+
             if arrivals or (time.time() - self._last_good_update) > 90:
                 # during GTFS static data updates, the backend deletes the entire
                 # cache, and rebuilds from scratch. Takes about 60 seconds.
@@ -173,29 +172,96 @@ class BusStop:
                 # This if statement will update only if there's valid data, or
                 # if it's been 90 seconds without an update. This is to stop the
                 # last service of the night from getting stuck on the screen.
-                self._arrival_cache[stop_id] = arrivals
+                self._arrival_cache[stop_id] = prepare_service_arrivals(arrivals,
+                                                                        self._name_subs)
                 self._last_good_update = time.time()
 
+        # a failed update is retried at the fastest rate
+        secs = self._poll_min_secs
+        if updated:
+            secs = next_poll_secs(self.seconds_until_departure(),
+                                  self._poll_min_secs, self._poll_max_secs)
+        self._last_poll = time.ticks_ms()
+        self._next_poll = time.ticks_add(self._last_poll, 1000 * secs)
+
+    def ms_until_poll(self):
+        """Return the ms until this stop is due to be polled, 0 if it's due."""
+
+        if self._next_poll is None:
+            return 0
+        return max(0, time.ticks_diff(self._next_poll, time.ticks_ms()))
+
+    def ms_until_stale(self, budget_ms):
+        """Return the ms until the last poll of this stop is older than
+        the budget, 0 if it already is, or it's never been polled."""
+
+        if self._last_poll is None:
+            return 0
+        return max(0, budget_ms - time.ticks_diff(time.ticks_ms(), self._last_poll))
+
+    def seconds_until_departure(self):
+        """Return the seconds until the soonest departure, which may be
+        negative if it's due, or None if there are no services."""
+
+        now = now_epoch(apply_dst_offset=False)
+        soonest = None
+        for arrival in self.all_arrivals:
+            if arrival['epoch'] - now < -_DEPARTED_SECS:
+                continue
+            if soonest is None or arrival['epoch'] < soonest:
+                soonest = arrival['epoch']
+        return None if soonest is None else soonest - now
+
     @property
     def name(self):
         return self._name
 
+    @property
+    def is_default(self):
+        return self._is_default
+
     @property
     def all_arrivals(self):
         return [a for stop_id, arrivals in self._arrival_cache.items()
                   for a in arrivals]
 
     def arrival_board(self, count=4):
-        """Return the next `count` services for the arrival board of this stop."""
-
-        prepped = prepare_service_arrivals(self.all_arrivals, self._name_subs)
-        return list(sorted(prepped, key=lambda x: x['seconds']))[:count]
+        """Return the next `count` services for the arrival board of this
+        stop, counting down locally from the cached arrival times."""
+
+        now = now_epoch(apply_dst_offset=False)
+
+        board = []
+        for arr in self.all_arrivals:
+            secs = arr['epoch'] - now
+            if secs < -_DEPARTED_SECS:
+                continue
+            board.append({'route': arr['route'],
+                          'headsign': arr['headsign'],
+                          'scheduled': arr['scheduled'],
+                          'minutes': secs // 60,
+                          'seconds': secs})
+
+        return list(sorted(board, key=lambda x: x['seconds']))[:count]
+
+    def seconds_until_countdown_change(self, count=4):
+        """Return the number of whole seconds, after the current second, until
+        the minutes shown for any of the next `count` services changes, or
+        None if there are no services."""
+
+        soonest = None
+        for arrival in self.arrival_board(count):
+            # the minutes change when the seconds cross a multiple of 60
+            secs = arrival['seconds'] % 60
+            if soonest is None or secs < soonest:
+                soonest = secs
+        return soonest
 
 
 class BusStopContainer(ConfigImportMixin):
     """A container for the general settings of the display."""
 
-    def __init__(self, path, backend_url):
+    def __init__(self, path, backend_url, max_connections=MAX_CONNECTIONS):
         ConfigImportMixin.__init__(self)
         self.import_list_settings(path)
 
@@ -203,6 +269,10 @@ class BusStopContainer(ConfigImportMixin):
         self._url = backend_url
         self._build_stops()
 
+        # a client per concurrent request, each keeping its connection open
+        self._clients = [AsyncHTTPClient() for _ in range(max_connections)]
+        self.health = BACKEND_HEALTH
+
     def __getitem__(self, item) -> BusStop:
         return self._stops[item]
 
@@ -223,12 +293,180 @@ class BusStopContainer(ConfigImportMixin):
         for stop in self._stops:
             stop.set_name_substitutions(sub_dict)
 
+    def set_poll_interval(self, min_secs, max_secs):
+        for stop in self._stops:
+            stop.set_poll_interval(min_secs, max_secs)
+
     @property
     def stop_count(self):
         return len(self._stops)
 
-    def update_times(self):
-        """Update the cache of all bus stop times."""
+    @property
+    def default_index(self):
+        """The index of the stop marked as the default, or the first."""
+
+        for i, stop in enumerate(self._stops):
+            if stop.is_default:
+                return i
+        return 0
+
+    def routes(self):
+        """Return the set of routes seen across all stops."""
+
+        routes = set()
+        for stop in self._stops:
+            for arrival in stop.all_arrivals:
+                routes.add(arrival['route'])
+        return routes
+
+    @property
+    def stop_ids(self):
+        """Every distinct stop ID across all stops, in order."""
+
+        stop_ids = []
+        for stop in self._stops:
+            for stop_id in stop.stop_ids:
+                if stop_id not in stop_ids:
+                    stop_ids.append(stop_id)
+        return stop_ids
+
+    def _indices(self, indices):
+        return range(len(self._stops)) if indices is None else indices
+
+    def ms_until_poll(self, indices=None):
+        """Return the ms until the next of the stops at the given indices,
+        or any stop, is due to be polled, and the backend allows it."""
+
+        ms = min([self._stops[i].ms_until_poll() for i in self._indices(indices)])
+        return max(ms, self.health.ms_until_allowed())
+
+    def ms_until_stale(self, indices, budget_ms):
+        """Return the ms until the next of the stops at the given indices
+        is older than the staleness budget, and the backend allows it."""
+
+        ms = min([self._stops[i].ms_until_stale(budget_ms) for i in indices])
+        return max(ms, self.health.ms_until_allowed())
+
+    def update_times(self, indices=None, stale_budget_ms=None):
+        """Update the cache of the bus stops at the given indices, or all
+        stops, that are due to be polled, or with a staleness budget, that
+        are older than it. As many stop IDs are asked for in each request
+        as the backend url allows, and the results are shared between all
+        stops that show them. Requests are made concurrently, over up to
+        `max_connections` connections."""
+
+        stop_ids = []
+        for i in self._indices(indices):
+            stop = self._stops[i]
+            if stale_budget_ms is None:
+                due = stop.ms_until_poll() == 0
+            else:
+                due = stop.ms_until_stale(stale_budget_ms) == 0
+            if due:
+                stop_ids.extend([s for s in stop.stop_ids if s not in stop_ids])
+        if not stop_ids:
+            return
+
+        # while the backend is failing, the stops keep their cached arrivals
+        if not self.health.allow_request():
+            return
+
+        start = time.ticks_ms()
+        times = asyncio.run(self.fetch_times(stop_ids))
+
+        # the refresh as a whole fails only if nothing came back
+        if times:
+            self.health.record_success()
+        else:
+            self.health.record_failure()
 
+        # stops that weren't due, but had all their IDs fetched anyway
+        # by other stops, are updated too
         for stop in self._stops:
-            stop.update_times()
+            if all([stop_id in stop_ids for stop_id in stop.stop_ids]):
+                stop.set_times(times)
+
+        unchanged = len([t for t in times.values() if t[1] is NOT_MODIFIED])
+        log.info(f'fetched {len(times)} of {len(stop_ids)} stop(s), {unchanged} unchanged, '
+                 f'in {time.ticks_diff(time.ticks_ms(), start)} ms')
+
+    async def fetch_times(self, stop_ids):
+        """Fetch the times of the stop IDs, returning a dict of stop_id ->
+        (stop_name, arrivals) for those that succeeded. Each worker takes
+        the next request from the queue until it's empty."""
+
+        can_batch = batch_url(self._url, stop_ids[:1]) is not None
+        batch_size = _MAX_STOPS_PER_REQUEST if can_batch else 1
+
+        queue = [(stop_ids[i:i + batch_size], can_batch)
+                 for i in range(0, len(stop_ids), batch_size)]
+        times = {}
+        active = 0
+
+        async def worker(client):
+            nonlocal active
+
+            # a batch that left out stops adds them to the queue, so wait
+            # for the other workers before finishing
+            while queue or active:
+                if not queue:
+                    await asyncio.sleep(_IDLE_WORKER_SECS)
+                    continue
+
+                batch, batched = queue.pop(0)
+                active += 1
+                try:
+                    await self._fetch(client, batch, batched, queue, times)
+                finally:
+                    active -= 1
+
+        await asyncio.gather(*[worker(client) for client in self._clients[:len(queue)]])
+        return times
+
+    async def _fetch(self, client, batch, batched, queue, times):
+        if not batched:
+            stop_id = batch[0]
+            stop_times = await self._fetch_stop(client, stop_id)
+            if stop_times is not None:
+                times[stop_id] = stop_times
+            return
+
+        try:
+            batch_times = await self._read(client, batch_url(self._url, batch), batch)
+        except (OSError, ValueError, asyncio.TimeoutError) as exc:
+            # asking for each stop on its own would only multiply the
+            # requests to a failing backend, so they wait for the next refresh
+            log.error(f'Batched update of stops {batch} failed', exc=exc)
+            return
+
+        times.update(batch_times)
+
+        # each stop the response left out is asked for on its own
+        missing = [stop_id for stop_id in batch if stop_id not in batch_times]
+        if missing and len(batch) > 1:
+            log.error(f'Batched update didn\'t include stops {missing}, '
+                      'updating them one at a time')
+            queue.extend([([stop_id], False) for stop_id in missing])
+
+    async def _read(self, client, url, stop_ids):
+        try:
+            return await asyncio.wait_for(read_stops_times(client, url, stop_ids),
+                                          client.timeout)
+        except asyncio.TimeoutError:
+            # the request was abandoned part way, so the connection can't be reused
+            client.close()
+            raise
+
+    async def _fetch_stop(self, client, stop_id):
+        """Fetch one stop, returning None if it failed. It's not retried
+        until the next refresh, so the other stops aren't held up."""
+
+        try:
+            times = await self._read(client, self._url.format(stop_id), [stop_id])
+        except (OSError, ValueError, asyncio.TimeoutError) as exc:
+            log.error(f'Exception during update of stop {stop_id}:', exc=exc)
+            return None
+
+        if stop_id not in times:
+            log.error(f'Update of stop {stop_id} didn\'t include any data')
+        return times.get(stop_id)
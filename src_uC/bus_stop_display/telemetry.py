@@ -16,6 +16,7 @@ import machine
 import platform
 
 from .log_tools import open_logfile
+from .backend_health import BACKEND_HEALTH
 
 
 def machine_id():
@@ -74,6 +75,13 @@ def get_telemetry():
         
         reset-cause: {_reset_cause()}
         
+        backend-breaker: {BACKEND_HEALTH.state}
+        backend-failures-in-a-row: {BACKEND_HEALTH.failures}
+        backend-failures-total: {BACKEND_HEALTH.total_failures}
+        backend-breaker-trips: {BACKEND_HEALTH.trips}
+        backend-requests-held-off: {BACKEND_HEALTH.rejected}
+        backend-next-request-ms: {BACKEND_HEALTH.ms_until_allowed()}
+        
         memory-free: {free:,d} bytes ({free / total:.2%})
         memory-alloc: {alloc:,d} bytes ({alloc / total:.2%})
         
@@ -84,6 +84,27 @@ def now_epoch(apply_dst_offset=True):
     return time.time() + 3600 * _utc_offset_hours(cur_time)
 
 
+def _now_ms():
+    """Return the current time in ms since the epoch, with sub-second
+    resolution where the port supports it."""
+
+    try:
+        return time.time_ns() // 1_000_000
+    except AttributeError:
+        return time.time() * 1000
+
+
+def ms_until_next_second():
+    """Return the number of ms until the time in seconds next changes."""
+    return 1000 - (_now_ms() % 1000)
+
+
+def ms_until_next_minute():
+    """Return the number of ms until the next wall-clock minute. Daylight
+    savings offsets are whole hours, so this is the same in local time."""
+    return 60_000 - (_now_ms() % 60_000)
+
+
 def timestamp_to_epoch(timestamp):
     """Convert a string timestamp to epoch time.
     Format as per data backend: 2025-03-21T18:34:10
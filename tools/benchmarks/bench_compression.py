@@ -0,0 +1,90 @@
+"""
+`bench_compression`
+====================================================
+
+Compare the bytes received over the wire, and the end-to-end time
+to fetch, decompress and parse the arrivals of both sample pages,
+with and without asking for a compressed response. Both go through
+read_stops_times(), as the device does, so a compressed body is
+decompressed as it arrives. Start the stand-in backend, emulating
+the throughput of the Pico W's link, then run from the root of the
+repo with the MicroPython unix port, which has the `deflate` module:
+
+    python tools/fake_backend.py --port 8080 --link-kbps 1000 &
+    micropython tools/benchmarks/bench_compression.py http://localhost:8080
+
+* Author: Kevin O'Connell
+
+"""
+
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, 'src_uC/bus_stop_display')
+
+import arrivals_fetch
+from arrivals_fetch import read_stops_times, batch_url
+from http_client import AsyncHTTPClient, accept_encoding
+
+
+# the distinct stops of both pages in the sample stops.cfg
+STOPS = [241991, 241471, 243881, 240171, 241721, 240491, 241201]
+CYCLES = 10
+URL = '/api/v1/arrivals?stop={}'
+HEADERS = {'Accept': 'application/json'}
+
+
+class CountingClient(AsyncHTTPClient):
+    """Keep the last response, to count the body bytes sent for it."""
+
+    async def get(self, url, headers=None):
+        self.response = await AsyncHTTPClient.get(self, url, headers)
+        return self.response
+
+
+def fetch(client, url):
+    """Fetch and parse the url, returning the body bytes on the wire."""
+
+    # every request is plain, so the body is always sent
+    arrivals_fetch._VALIDATORS.forget(url)
+    asyncio.run(read_stops_times(client, url, STOPS))
+    return int(client.response.headers['content-length'])
+
+
+def run(name, url, headers):
+    arrivals_fetch._REQUEST_HEADERS = headers
+    client = CountingClient()
+    fetch(client, url)
+
+    wire_bytes = 0
+    start = time.ticks_ms()
+    for _ in range(CYCLES):
+        wire_bytes += fetch(client, url)
+    mean_ms = time.ticks_diff(time.ticks_ms(), start) / CYCLES
+
+    encoding = client.response.headers.get('content-encoding', 'identity')
+    print(f'{name:<14} {encoding:<9} {wire_bytes // CYCLES:>7} B/fetch '
+          f'{mean_ms:>8.1f} ms/fetch')
+    return wire_bytes, mean_ms
+
+
+def main():
+    base_url = sys.argv[1] if len(sys.argv) > 1 else 'http://localhost:8080'
+    print(f'{len(STOPS)} stops in one request, {CYCLES} fetches, against {base_url}')
+
+    compressed_headers = accept_encoding(HEADERS)
+    if compressed_headers is HEADERS:
+        print('no deflate module, compressed responses are not supported')
+        return
+
+    url = batch_url(base_url + URL, STOPS)
+    plain_bytes, plain_ms = run('uncompressed', url, HEADERS)
+    for encoding in compressed_headers['Accept-Encoding'].split(', '):
+        headers = dict(HEADERS)
+        headers['Accept-Encoding'] = encoding
+        wire_bytes, mean_ms = run('compressed', url, headers)
+        print(f'{"":<24} {wire_bytes / plain_bytes:>9.0%} {mean_ms / plain_ms:>17.0%} of uncompressed')
+
+
+main()
@@ -0,0 +1,78 @@
+"""
+`bench_concurrent`
+====================================================
+
+Compare the time taken to fetch the arrivals of both sample pages,
+one request per stop, one after another on a single AsyncHTTPClient,
+against a growing number of connections making requests at once.
+Start the stand-in backend with a delay on each response, so the
+time is spent waiting on the server, then run from the root of the
+repo with the MicroPython unix port:
+
+    python tools/fake_backend.py --port 8080 --latency-ms 300 &
+    micropython tools/benchmarks/bench_concurrent.py http://localhost:8080
+
+* Author: Kevin O'Connell
+
+"""
+
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, 'src_uC/bus_stop_display')
+
+from http_client import AsyncHTTPClient
+
+
+# the distinct stops of both pages in the sample stops.cfg
+STOPS = [241991, 241471, 243881, 240171, 241721, 240491, 241201]
+CONNECTIONS = [2, 4]
+CYCLES = 3
+URL = '/api/v1/arrivals?stop={}'
+HEADERS = {'Accept': 'application/json'}
+
+
+async def fetch_concurrent(clients, base_url):
+    queue = list(STOPS)
+
+    async def worker(client):
+        buffer = bytearray(512)
+        while queue:
+            response = await client.get(base_url + URL.format(queue.pop(0)), headers=HEADERS)
+            while await response.readinto(buffer):
+                pass
+
+    await asyncio.gather(*[worker(client) for client in clients])
+
+
+def time_cycles(name, fetch):
+    # the first cycle opens the connections, which isn't timed
+    fetch()
+
+    start = time.ticks_ms()
+    for _ in range(CYCLES):
+        fetch()
+    mean = time.ticks_diff(time.ticks_ms(), start) / CYCLES
+
+    print(f'{name:<28} {mean:8.1f} ms/cycle')
+    return mean
+
+
+def main():
+    base_url = sys.argv[1] if len(sys.argv) > 1 else 'http://localhost:8080'
+    print(f'{len(STOPS)} stops per cycle, {CYCLES} cycles, against {base_url}')
+
+    # one connection makes the requests one after another
+    single = [AsyncHTTPClient()]
+    baseline = time_cycles('sequential, 1 connection',
+                           lambda: asyncio.run(fetch_concurrent(single, base_url)))
+
+    for count in CONNECTIONS:
+        clients = [AsyncHTTPClient() for _ in range(count)]
+        mean = time_cycles(f'concurrent, {count} connection(s)',
+                           lambda: asyncio.run(fetch_concurrent(clients, base_url)))
+        print(f'{"":<28} {baseline / mean:8.1f}x faster')
+
+
+main()
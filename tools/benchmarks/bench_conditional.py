@@ -0,0 +1,80 @@
+"""
+`bench_conditional`
+====================================================
+
+Compare the bytes received, and the time taken to fetch and parse
+the arrivals of a page of stops, polled every second, with plain
+requests, against conditional requests that send back the ETag and
+Last-Modified validators of the last response. Both go through
+read_stops_times(), as the device does. Start the stand-in backend,
+with the arrivals changing every 10 seconds, then run from the root
+of the repo with the MicroPython unix port:
+
+    python tools/fake_backend.py --port 8080 --update-secs 10 &
+    micropython tools/benchmarks/bench_conditional.py http://localhost:8080
+
+* Author: Kevin O'Connell
+
+"""
+
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, 'src_uC/bus_stop_display')
+
+import arrivals_fetch
+from arrivals_fetch import read_stops_times, batch_url, NOT_MODIFIED
+from http_client import AsyncHTTPClient
+
+
+# the stops of the "Pana Southbound" page, from the sample stops.cfg
+STOPS = [241991, 241471, 243881, 240171]
+CYCLES = 20
+POLL_MS = 1000
+URL = '/api/v1/arrivals?stop={}'
+
+
+class CountingClient(AsyncHTTPClient):
+    """Keep the last response, to count the body bytes sent for it."""
+
+    async def get(self, url, headers=None):
+        self.response = await AsyncHTTPClient.get(self, url, headers)
+        return self.response
+
+
+def run(name, url, conditional):
+    client = CountingClient()
+    received = busy_ms = not_modified = 0
+
+    for _ in range(CYCLES):
+        if not conditional:
+            # without the last response's validators, every request is plain
+            arrivals_fetch._VALIDATORS.forget(url)
+
+        start = time.ticks_ms()
+        times = asyncio.run(read_stops_times(client, url, STOPS))
+        busy_ms += time.ticks_diff(time.ticks_ms(), start)
+
+        received += int(client.response.headers.get('content-length', 0))
+        not_modified += times[STOPS[0]][1] is NOT_MODIFIED
+        time.sleep_ms(POLL_MS)
+
+    print(f'{name:<12} {received:>9} B {busy_ms / CYCLES:>8.1f} ms/poll '
+          f'{not_modified:>4} of {CYCLES} not modified')
+    return received, busy_ms
+
+
+def main():
+    base_url = sys.argv[1] if len(sys.argv) > 1 else 'http://localhost:8080'
+    print(f'{len(STOPS)} stops, polled {CYCLES} times, every {POLL_MS} ms, against {base_url}')
+
+    url = batch_url(base_url + URL, STOPS)
+    plain_bytes, plain_ms = run('plain', url, False)
+    cond_bytes, cond_ms = run('conditional', url, True)
+
+    print(f'body bytes {cond_bytes / plain_bytes:.0%}, fetch and parse time '
+          f'{cond_ms / plain_ms:.0%} of plain requests')
+
+
+main()
@@ -0,0 +1,89 @@
+"""
+`bench_fetch`
+====================================================
+
+Compare the time taken to fetch the arrivals of every stop on a
+page, one request per stop, using a new connection for every
+request (as urequests does), against the keep-alive AsyncHTTPClient.
+Start the stand-in backend first, emulating the cost of the TLS
+handshake on the Pico W, then run from the root of the repo with
+the MicroPython unix port:
+
+    python tools/fake_backend.py --port 8080 --connect-ms 300 &
+    micropython tools/benchmarks/bench_fetch.py http://localhost:8080
+
+* Author: Kevin O'Connell
+
+"""
+
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, 'src_uC/bus_stop_display')
+
+from http_client import AsyncHTTPClient
+
+
+# the stops of the "Pana Southbound" page, from the sample stops.cfg
+STOPS = [241991, 241471, 243881, 240171]
+CYCLES = 10
+URL = '/api/v1/arrivals?stop={}'
+HEADERS = {'Accept': 'application/json'}
+
+_BUFFER = bytearray(8192)
+
+
+def fetch_with_urequests(base_url):
+    import urequests as requests
+
+    for stop_id in STOPS:
+        r = requests.get(base_url + URL.format(stop_id), headers=HEADERS)
+        r.raw.readinto(_BUFFER)
+        r.close()
+
+
+async def fetch_with_client(client, base_url):
+    for stop_id in STOPS:
+        response = await client.get(base_url + URL.format(stop_id), headers=HEADERS)
+        while await response.readinto(_BUFFER):
+            pass
+
+
+def time_cycles(name, fetch):
+    times = []
+    for _ in range(CYCLES):
+        start = time.ticks_ms()
+        fetch()
+        times.append(time.ticks_diff(time.ticks_ms(), start))
+
+    mean = sum(times) / len(times)
+    print(f'{name:<28} {mean:8.1f} ms/cycle  (min {min(times)}, max {max(times)})')
+    return mean
+
+
+def main():
+    base_url = sys.argv[1] if len(sys.argv) > 1 else 'http://localhost:8080'
+    print(f'{len(STOPS)} stops per cycle, {CYCLES} cycles, against {base_url}')
+
+    try:
+        import urequests
+    except ImportError:
+        # the same as urequests, a new connection for every request
+        fresh = AsyncHTTPClient(keep_alive=False)
+        baseline = time_cycles('new connection per request',
+                               lambda: asyncio.run(fetch_with_client(fresh, base_url)))
+        connections = fresh.connections
+    else:
+        baseline = time_cycles('urequests', lambda: fetch_with_urequests(base_url))
+        connections = CYCLES * len(STOPS)
+
+    client = AsyncHTTPClient()
+    kept = time_cycles('keep-alive AsyncHTTPClient',
+                       lambda: asyncio.run(fetch_with_client(client, base_url)))
+
+    print(f'connections opened: {connections} vs {client.connections}')
+    print(f'speed up: {baseline / kept:.1f}x')
+
+
+main()
@@ -0,0 +1,92 @@
+"""
+`bench_parse`
+====================================================
+
+Compare the memory needed to parse the response for a page of
+four stops, as the number of arrivals in it grows, reading the
+whole response into a buffer for json.loads, against the
+streaming ArrivalsParser fed 512 byte chunks. The memory is
+what's held once parsing is done: the response buffer and the
+parsed result for json.loads, the chunk buffer and the arrivals
+kept for the parser. Run from the root of the repo with the
+MicroPython unix port:
+
+    micropython tools/benchmarks/bench_parse.py
+
+* Author: Kevin O'Connell
+
+"""
+
+import gc
+import sys
+import json
+import time
+
+sys.path.insert(0, 'src_uC/bus_stop_display')
+
+from arrivals_parser import ArrivalsParser
+
+
+STOP_IDS = [241991, 241471, 243881, 240171]
+ARRIVAL_COUNTS = [6, 12, 24, 48, 96]
+CHUNK_BYTES = 512
+
+ARRIVAL = ('{{"route": "220X", "route_type": "BUS", "agency": "Bus \\u00c9ireann", '
+           '"headsign": "Mahon Point Shopping Centre", "direction": 1, '
+           '"trip_id": "4521_{}", "scheduled_arrival": "2026-10-17T10:{:02d}:00", '
+           '"real_time_arrival": "2026-10-17T10:{:02d}:30"}}')
+
+
+def make_response(arrival_count):
+    stops = []
+    for stop_id in STOP_IDS:
+        arrivals = ', '.join([ARRIVAL.format(i, i % 60, i % 60) for i in range(arrival_count)])
+        stops.append(f'"{stop_id}": {{"stop_name": "Stop {stop_id}", "arrivals": [{arrivals}]}}')
+    return ('{' + ', '.join(stops) + '}').encode()
+
+
+def parse_with_json(data):
+    buffer = bytearray(data)
+    return buffer, json.loads(buffer)
+
+
+def parse_streaming(data):
+    chunk = bytearray(CHUNK_BYTES)
+    parser = ArrivalsParser(STOP_IDS)
+    mv = memoryview(data)
+    for i in range(0, len(data), CHUNK_BYTES):
+        count = min(CHUNK_BYTES, len(data) - i)
+        chunk[:count] = mv[i:i + count]
+        parser.feed(memoryview(chunk)[:count])
+    return chunk, parser.result()
+
+
+def measure(parse):
+    """Return the bytes held by the result of parse(), and the time taken."""
+
+    gc.collect()
+    before = gc.mem_alloc()
+    start = time.ticks_ms()
+    result = parse()
+    elapsed = time.ticks_diff(time.ticks_ms(), start)
+    gc.collect()
+    held = gc.mem_alloc() - before
+    del result
+    return held, elapsed
+
+
+def main():
+    print(f'{len(STOP_IDS)} stops, {CHUNK_BYTES} byte chunks')
+    print(f'{"arrivals":>8} {"response":>9} {"json.loads":>16} {"streaming":>16}')
+
+    for arrival_count in ARRIVAL_COUNTS:
+        data = make_response(arrival_count)
+
+        json_held, json_ms = measure(lambda: parse_with_json(data))
+        stream_held, stream_ms = measure(lambda: parse_streaming(data))
+
+        print(f'{arrival_count:>8} {len(data):>9} {json_held:>8} B {json_ms:>4} ms '
+              f'{stream_held:>8} B {stream_ms:>4} ms')
+
+
+main()
@@ -0,0 +1,100 @@
+"""
+`bench_polling`
+====================================================
+
+Model a day of polling for one page of four stops, counting the
+requests made each hour at a fixed 5 second interval, against the
+adaptive poll policy. The timetable is made up, but typical of a
+city route: frequent at peak times, sparse in the evening, and no
+service overnight. Run from the root of the repo with the
+MicroPython unix port:
+
+    micropython tools/benchmarks/bench_polling.py
+
+* Author: Kevin O'Connell
+
+"""
+
+import sys
+
+sys.path.insert(0, 'src_uC/bus_stop_display')
+
+from poll_policy import next_poll_secs, POLL_INTERVAL_MIN_SECS, POLL_INTERVAL_MAX_SECS
+
+
+FIXED_INTERVAL_SECS = 5
+STOPS = 4
+
+# (first hour, minutes between buses at each stop), until the next entry,
+# None means no service
+HEADWAYS = [(0, 30), (1, None), (6, 20), (7, 10), (10, 15), (16, 10),
+            (19, 20), (22, 30)]
+
+# the backend lists arrivals for this long after they're due
+LISTED_AFTER_SECS = 60
+
+DAY_SECS = 24 * 3600
+
+
+def headway_at(secs):
+    headway = None
+    for hour, minutes in HEADWAYS:
+        if secs >= hour * 3600:
+            headway = minutes
+    return headway
+
+
+def timetable():
+    """Return the sorted departure times of all stops on the page,
+    each stop offset from the others."""
+
+    departures = []
+    for stop in range(STOPS):
+        secs = 300 + 137 * stop
+        while secs < DAY_SECS:
+            headway = headway_at(secs)
+            if headway is None:
+                # skip to the next hour
+                secs = (secs // 3600 + 1) * 3600
+                continue
+            departures.append(secs)
+            secs += headway * 60
+    return sorted(departures)
+
+
+def soonest_departure(departures, now):
+    for secs in departures:
+        if secs >= now - LISTED_AFTER_SECS:
+            return secs - now
+    return None
+
+
+def polls_per_hour(departures, interval):
+    hours = [0] * 24
+    now = 0
+    while now < DAY_SECS:
+        hours[now // 3600] += 1
+        now += interval(soonest_departure(departures, now))
+    return hours
+
+
+def main():
+    departures = timetable()
+
+    fixed = polls_per_hour(departures, lambda soonest: FIXED_INTERVAL_SECS)
+    adaptive = polls_per_hour(departures, next_poll_secs)
+
+    print(f'{STOPS} stops, {len(departures)} departures, '
+          f'polled every {FIXED_INTERVAL_SECS} s fixed, against '
+          f'{POLL_INTERVAL_MIN_SECS}-{POLL_INTERVAL_MAX_SECS} s adaptive')
+    print(f'{"hour":>4} {"headway":>8} {"fixed":>6} {"adaptive":>9}')
+    for hour in range(24):
+        headway = headway_at(hour * 3600)
+        headway = f'{headway} min' if headway else '-'
+        print(f'{hour:>4} {headway:>8} {fixed[hour]:>6} {adaptive[hour]:>9}')
+
+    print(f'{"day":>4} {"":>8} {sum(fixed):>6} {sum(adaptive):>9}  '
+          f'({sum(adaptive) / sum(fixed):.0%} of fixed)')
+
+
+main()
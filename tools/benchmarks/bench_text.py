@@ -0,0 +1,54 @@
+"""
+`bench_text`
+====================================================
+
+Compare the old file-backed FontRenderer against the RAM resident
+FontAtlas, drawing a typical schedule line. Run from the root of
+the repo with the MicroPython unix port:
+
+    micropython tools/benchmarks/bench_text.py
+
+* Author: Kevin O'Connell
+
+"""
+
+import sys
+import time
+
+sys.path.insert(0, 'src_uC/bus_stop_display/display')
+
+from framebuf import FrameBuffer, MONO_HLSB
+from font import FontRenderer
+from font_atlas import FontAtlas
+
+
+FONT_FILE = 'src_uC/bus_stop_display/assets/font5x8.bin'
+LINE = 'Kent Station'
+REPEATS = 500
+
+
+def bench(name, draw):
+    """Time `draw` over all repeats, and print the time per call."""
+
+    start = time.ticks_us()
+    for _ in range(REPEATS):
+        draw()
+    elapsed = time.ticks_diff(time.ticks_us(), start)
+
+    print(f'{name:<16s} {elapsed / REPEATS:8.1f} us per text() call')
+    return elapsed
+
+
+def main():
+    fb = FrameBuffer(bytearray(1024), 128, 64, MONO_HLSB)
+
+    with FontRenderer(128, 64, fb.pixel, font_name=FONT_FILE) as renderer:
+        old = bench('FontRenderer', lambda: renderer.text(LINE, 30, 20, 1))
+
+    atlas = FontAtlas(FONT_FILE)
+    new = bench('FontAtlas', lambda: atlas.text(fb, LINE, 30, 20, 1))
+
+    print(f'speed up: {old / new:.1f}x')
+
+
+main()
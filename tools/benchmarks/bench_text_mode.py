@@ -0,0 +1,92 @@
+"""
+`bench_text_mode`
+====================================================
+
+Compare the SPI traffic needed to update the minutes on three
+schedule lines, drawn in the graphics RAM versus written to the
+text RAM, and verify the composed output using the host side
+emulation of the display. Run from the root of the repo with the
+MicroPython unix port:
+
+    micropython tools/benchmarks/bench_text_mode.py
+
+The composed frame is written to `hybrid_board.pbm`.
+
+* Author: Kevin O'Connell
+
+"""
+
+import sys
+
+sys.path.insert(0, 'tools')
+sys.path.insert(0, 'src_uC/bus_stop_display/display')
+
+from st7920_emulator import install_fake_machine, FakeSPI, FakePin, Font5x8, write_pbm
+install_fake_machine()
+
+from st7920_display import ST7920, TEXT_COLUMNS, TEXT_CHAR_HEIGHT
+from font_atlas import FontAtlas
+
+
+FONT_FILE = 'src_uC/bus_stop_display/assets/font5x8.bin'
+LINES = [('220', 'Ballincollig'), ('208', 'Lotabeg'), ('214', 'CUH')]
+TICKS = 10
+
+
+def draw_static(display, font):
+    """Draw the route badges and headsigns, which don't change."""
+
+    for i, (route, headsign) in enumerate(LINES):
+        y = (TEXT_CHAR_HEIGHT * (i + 1)) + 2
+        display.fill_rect(1, y, 29, 11, 1)
+        font.text(display, route, 5, y + 2, 0)
+        font.text(display, headsign, 34, y + 2, 1)
+
+
+def run(text_mode):
+    spi = FakeSPI()
+    display = ST7920(spi, 128, 64, chip_select=FakePin(), reset=FakePin())
+    font = FontAtlas(FONT_FILE)
+
+    draw_static(display, font)
+    display.show()
+
+    total = 0
+    for tick in range(TICKS):
+        for i in range(len(LINES)):
+            minutes = str(20 - tick + (5 * i))
+            y = (TEXT_CHAR_HEIGHT * (i + 1)) + 2
+            if text_mode:
+                before = display.text_bytes_total
+                display.write_text(i + 1, TEXT_COLUMNS - 3, ' ' * (3 - len(minutes)) + minutes)
+                total += display.text_bytes_total - before
+            else:
+                display.fill_rect(110, y, 18, 11, 0)
+                font.text(display, minutes, 128 - (6 * len(minutes)) - 1, y + 2, 1)
+
+        if not text_mode:
+            display.show()
+            total += display.bytes_sent
+
+    # the emulated display must match what the driver thinks it sent
+    emulator = spi.emulator
+    assert emulator.graphics_frame() == bytes(display.framebuf), 'graphics RAM mismatch'
+    for row in range(4):
+        expected = bytes(display.text_shadow[row * TEXT_COLUMNS:(row + 1) * TEXT_COLUMNS])
+        assert emulator.text_row(row) == expected, 'text RAM mismatch'
+
+    return total, emulator
+
+
+def main():
+    graphics_bytes, _ = run(text_mode=False)
+    text_bytes, emulator = run(text_mode=True)
+
+    print(f'graphics RAM: {graphics_bytes / TICKS:6.1f} bytes per minute update')
+    print(f'text RAM:     {text_bytes / TICKS:6.1f} bytes per minute update')
+
+    write_pbm('hybrid_board.pbm', emulator.composed_frame(Font5x8(FONT_FILE)))
+    print('composed frame written to hybrid_board.pbm')
+
+
+main()
@@ -0,0 +1,253 @@
+"""
+`fake_backend`
+====================================================
+
+A local stand-in for the TFI GTFS data backend, serving made up
+arrivals in the same format, so the display and the benchmarks
+can be run without the real docker container:
+
+    python tools/fake_backend.py --port 8080
+
+and point the `data_backend_url` at it:
+
+    data_backend_url=http://<this machine>:8080/api/v1/arrivals?stop={}
+
+Responses carry an ETag and a Last-Modified date, and conditional
+requests for arrivals that haven't changed are answered with a 304.
+They're compressed with gzip or deflate, if the request accepts it.
+
+Connections are kept alive, like the real backend behind a reverse
+proxy. The cost of a TLS handshake on the Pico W can be emulated
+by delaying each new connection, and idle connections are closed
+after a timeout, to exercise the client's reconnection. The time
+to send a body over the Pico W's link can be emulated from its size.
+
+* Author: Kevin O'Connell
+
+"""
+
+import gzip
+import json
+import zlib
+import time
+import socket
+import hashlib
+import random
+import argparse
+import threading
+
+from datetime import datetime, timedelta, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+ROUTES = ['202', '203', '205', '206', '207', '208', '209', '212',
+          '213', '214', '215', '216', '219', '220', '220X', '223', '226']
+HEADSIGNS = ['Ballincollig', 'Mahon Point Shopping Centre', 'University Hospital',
+             'Kent Train Station', 'Bishopstown via CUH', 'Douglas', 'Lotabeg',
+             'Carrigaline via Douglas Road', 'Ballyvolane Shopping Centre',
+             'Knocknaheeny', 'Blackpool', 'Glanmire', 'Tivoli Industrial Estate']
+
+
+class Backend:
+    """The arrivals of each stop, fixed for a while, like the real
+    backend, which only changes as the real time feed updates."""
+
+    def __init__(self, arrivals_per_stop=12, update_secs=30):
+        self.arrivals_per_stop = arrivals_per_stop
+        self.update_secs = update_secs
+
+        self._lock = threading.Lock()
+        self._stops = {}
+
+    def stop(self, stop_id):
+        """Return the time the arrivals of the stop were generated, and
+        the arrivals."""
+
+        with self._lock:
+            generated, data = self._stops.get(stop_id, (0, None))
+            if time.time() - generated >= self.update_secs:
+                data = self._generate(stop_id)
+                generated = int(time.time())
+                self._stops[stop_id] = (generated, data)
+            return generated, data
+
+    def _generate(self, stop_id):
+        rng = random.Random(f'{stop_id}-{int(time.time()) // self.update_secs}')
+        now = datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None)
+
+        arrivals = []
+        for i in range(self.arrivals_per_stop):
+            scheduled = now + timedelta(seconds=rng.randrange(60, 3600))
+            delay = timedelta(seconds=rng.choice([0, 0, 30, 90, 240, -60]))
+            arrivals.append({
+                'route': rng.choice(ROUTES),
+                'route_type': 'BUS',
+                'agency': 'Bus Éireann',
+                'headsign': rng.choice(HEADSIGNS),
+                'direction': rng.randrange(2),
+                'trip_id': f'{rng.randrange(10 ** 6)}_{rng.randrange(10 ** 5)}',
+                'scheduled_arrival': scheduled.isoformat(),
+                'real_time_arrival': (scheduled + delay).isoformat(),
+            })
+
+        arrivals.sort(key=lambda a: a['real_time_arrival'])
+        return {'stop_name': f'Stop {stop_id}', 'arrivals': arrivals}
+
+
+def make_handler(backend, args):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        # idle keep-alive connections are closed after this many seconds
+        timeout = args.idle_timeout
+
+        def setup(self):
+            super().setup()
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if args.connect_ms:
+                time.sleep(args.connect_ms / 1000)
+            self.server.stats['connections'] += 1
+
+        def log_message(self, format, *log_args):
+            if args.verbose:
+                super().log_message(format, *log_args)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            stop_ids = parse_qs(url.query).get('stop', [])
+            if url.path != '/api/v1/arrivals' or not stop_ids:
+                self.send_error(404)
+                return
+
+            if args.latency_ms:
+                time.sleep(args.latency_ms / 1000)
+
+            body = {}
+            last_modified = 0
+            for stop_id in stop_ids:
+                generated, body[stop_id] = backend.stop(stop_id)
+                last_modified = max(last_modified, generated)
+            body = json.dumps(body).encode()
+
+            self.server.stats['requests'] += 1
+            headers = {}
+            encoding = self.content_encoding()
+            if encoding is not None:
+                headers['Content-Encoding'] = encoding
+
+            if not args.no_validators:
+                # the compressed and uncompressed bodies have their own tags
+                etag = hashlib.sha1(body).hexdigest()[:16] + ('-' + encoding if encoding else '')
+                headers['ETag'] = '"' + etag + '"'
+                headers['Last-Modified'] = formatdate(last_modified, usegmt=True)
+
+                if self.not_modified(headers['ETag'], last_modified):
+                    self.send_response(304)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.server.stats['not_modified'] += 1
+                    return
+
+            self.server.stats['uncompressed_bytes'] += len(body)
+            if encoding == 'gzip':
+                body = gzip.compress(body)
+            elif encoding == 'deflate':
+                body = zlib.compress(body)
+            self.send_body(body, headers)
+
+        def content_encoding(self):
+            """Return the compression to use, the first accepted."""
+
+            if args.no_compression:
+                return None
+            for encoding in self.headers.get('Accept-Encoding', '').split(','):
+                encoding = encoding.split(';')[0].strip().lower()
+                if encoding in ('gzip', 'deflate'):
+                    return encoding
+            return None
+
+        def not_modified(self, etag, last_modified):
+            if_none_match = self.headers.get('If-None-Match')
+            if if_none_match is not None:
+                return etag in [tag.strip() for tag in if_none_match.split(',')]
+
+            if_modified_since = self.headers.get('If-Modified-Since')
+            if if_modified_since is not None:
+                try:
+                    since = parsedate_to_datetime(if_modified_since).timestamp()
+                except (TypeError, ValueError):
+                    return False
+                return last_modified <= since
+
+            return False
+
+        def send_body(self, body, headers=None):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+
+            # emulate a slow link, by the time the body takes to send
+            if args.link_kbps:
+                time.sleep(len(body) * 8 / (args.link_kbps * 1000))
+            self.wfile.write(body)
+
+            self.server.stats['bytes'] += len(body)
+
+    return Handler
+
+
+def serve(args, ready=None):
+    """Run the server until interrupted, or in the background if
+    `ready` is an Event, which is set once it's listening."""
+
+    backend = Backend(args.arrivals, args.update_secs)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(backend, args))
+    server.daemon_threads = True
+    server.stats = {'connections': 0, 'requests': 0, 'not_modified': 0,
+                    'bytes': 0, 'uncompressed_bytes': 0}
+
+    if ready is not None:
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        ready.set()
+        return server
+
+    print(f'serving arrivals on http://{args.host}:{server.server_port}/api/v1/arrivals?stop=')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return server
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='A stand-in for the TFI GTFS backend.')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--arrivals', type=int, default=12, help='arrivals per stop')
+    parser.add_argument('--update-secs', type=int, default=30,
+                        help='how often the arrivals of each stop change')
+    parser.add_argument('--connect-ms', type=int, default=0,
+                        help='delay each new connection, to emulate a TLS handshake')
+    parser.add_argument('--latency-ms', type=int, default=0, help='delay each response')
+    parser.add_argument('--link-kbps', type=int, default=0,
+                        help='delay each body by the time it takes to send at this rate')
+    parser.add_argument('--idle-timeout', type=float, default=15,
+                        help='close keep-alive connections idle for this many seconds')
+    parser.add_argument('--no-validators', action='store_true',
+                        help="don't send ETag or Last-Modified, or answer conditional requests")
+    parser.add_argument('--no-compression', action='store_true',
+                        help="don't compress responses, even if the request accepts it")
+    parser.add_argument('-v', '--verbose', action='store_true')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    serve(parse_args())
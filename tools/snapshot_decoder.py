@@ -0,0 +1,225 @@
+"""
+`snapshot_decoder`
+====================================================
+
+Rebuild the screen of a display from the snapshots it publishes
+over MQTT, see `src_uC/bus_stop_display/display/snapshot.py` for
+the format. Each decoded frame is written as a PBM or PNG image,
+depending on the file extension.
+
+Decode snapshots saved to files, in the order they were sent:
+
+    python tools/snapshot_decoder.py -o screen.png snap_0.bin snap_1.bin
+
+Or subscribe to the screen topic of a device, request a snapshot,
+and keep the image up to date as it streams (needs paho-mqtt):
+
+    python tools/snapshot_decoder.py -o screen.png --broker 10.0.0.1 \\
+        --topic /device/uPy-E6-61-64-08-43-23-55-2B --request
+
+* Author: Kevin O'Connell
+
+"""
+
+import os
+import sys
+import zlib
+import struct
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from st7920_emulator import Font5x8, compose_text, write_pbm
+
+
+SNAPSHOT_DELTA = 0x01
+SNAPSHOT_TEXT = 0x02
+
+HEADER_BYTES = 5
+TEXT_ROWS = 4
+TEXT_COLUMNS = 16
+
+FONT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                         'src_uC', 'bus_stop_display', 'assets', 'font5x8.bin')
+
+
+def unpack_bits(data, length):
+    """Decode PackBits data into `length` bytes."""
+
+    out = bytearray()
+    i = 0
+    while len(out) < length:
+        control = data[i]
+        if control < 128:
+            out += data[i + 1:i + control + 2]
+            i += control + 2
+        elif control > 128:
+            out += bytes([data[i + 1]]) * (257 - control)
+            i += 2
+        else:
+            i += 1
+
+    if len(out) != length:
+        raise ValueError(f'decoded {len(out)} bytes, expected {length}')
+    return out, i
+
+
+class SnapshotDecoder:
+    """Apply each snapshot to the last frame. Deltas are ignored until
+    the first key frame, or after a snapshot is missed."""
+
+    def __init__(self, font=None):
+        self.font = font
+        self.frame = None
+        self.text = None
+        self.width = self.height = 0
+        self._next_sequence = None
+
+        self.snapshots = 0
+        self.skipped = 0
+
+    def feed(self, message):
+        """Decode the snapshot, returning the composed frame, or None if
+        it can't be decoded yet."""
+
+        flags, width_bytes, height, sequence = struct.unpack_from('>BBBH', message)
+        length = width_bytes * height
+
+        delta = flags & SNAPSHOT_DELTA
+        if delta and (self.frame is None or sequence != self._next_sequence):
+            self.frame = None
+            self.skipped += 1
+            return None
+
+        data, used = unpack_bits(message[HEADER_BYTES:], length)
+        if delta:
+            data = bytearray(a ^ b for a, b in zip(self.frame, data))
+
+        self.frame = data
+        self.width, self.height = width_bytes * 8, height
+        self._next_sequence = (sequence + 1) & 0xFFFF
+        self.snapshots += 1
+
+        self.text = None
+        if flags & SNAPSHOT_TEXT:
+            start = HEADER_BYTES + used
+            text = message[start:start + (TEXT_ROWS * TEXT_COLUMNS)]
+            self.text = [text[row * TEXT_COLUMNS:(row + 1) * TEXT_COLUMNS]
+                         for row in range(TEXT_ROWS)]
+
+        return self.composed_frame()
+
+    def composed_frame(self):
+        frame = bytearray(self.frame)
+        if self.text and self.font is not None:
+            compose_text(frame, self.text, self.font)
+        return frame
+
+
+def write_png(path, frame, width, height, scale=4):
+    """Write a MONO_HLSB frame to a PNG file, black pixels on white,
+    scaled up to be easier to see."""
+
+    rows = []
+    row_bytes = width // 8
+    for y in range(height):
+        row = frame[y * row_bytes:(y + 1) * row_bytes]
+        pixels = bytes(0 if (row[x >> 3] >> (7 - (x & 7))) & 1 else 255
+                       for x in range(width) for _ in range(scale))
+        rows += [b'\x00' + pixels] * scale
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body))
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width * scale, height * scale,
+                                           8, 0, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(b''.join(rows))))
+        f.write(chunk(b'IEND', b''))
+
+
+def write_image(path, decoder, frame):
+    if path.lower().endswith('.png'):
+        write_png(path, frame, decoder.width, decoder.height)
+    else:
+        write_pbm(path, frame, decoder.width, decoder.height)
+
+
+def decode_files(decoder, paths, output):
+    frame = None
+    for path in paths:
+        with open(path, 'rb') as f:
+            frame = decoder.feed(f.read()) or frame
+
+    if frame is None:
+        sys.exit('no key frame found, nothing to decode')
+
+    write_image(output, decoder, frame)
+    print(f'decoded {decoder.snapshots} snapshot(s), skipped {decoder.skipped}, '
+          f'wrote {output}')
+
+
+def mirror_live(decoder, args):
+    try:
+        import paho.mqtt.client as mqtt
+    except ImportError:
+        sys.exit('paho-mqtt is needed to subscribe, try: pip install paho-mqtt')
+
+    def on_connect(client, userdata, flags, rc, *_):
+        client.subscribe(args.topic + '/screen')
+        if args.request:
+            client.publish(args.topic + '/screen/get', b'')
+
+    def on_message(client, userdata, msg):
+        frame = decoder.feed(msg.payload)
+        if frame is None:
+            # missed a snapshot, ask for a key frame to resync
+            client.publish(args.topic + '/screen/get', b'')
+            return
+
+        write_image(args.output, decoder, frame)
+        print(f'snapshot {decoder.snapshots}: {len(msg.payload)} bytes')
+
+    client = mqtt.Client()
+    client.on_connect = on_connect
+    client.on_message = on_message
+    if args.cafile:
+        client.tls_set(ca_certs=args.cafile, certfile=args.certfile, keyfile=args.keyfile)
+    if args.username:
+        client.username_pw_set(args.username, args.password)
+
+    client.connect(args.broker, args.port)
+    client.loop_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Decode display snapshots.')
+    parser.add_argument('files', nargs='*', help='saved snapshot messages, in order')
+    parser.add_argument('-o', '--output', default='screen.png', help='.png or .pbm image to write')
+    parser.add_argument('--broker', help='MQTT broker to subscribe to')
+    parser.add_argument('--port', type=int, default=1883)
+    parser.add_argument('--topic', help='the root topic of the device')
+    parser.add_argument('--request', action='store_true', help='request a snapshot on connecting')
+    parser.add_argument('--username')
+    parser.add_argument('--password')
+    parser.add_argument('--cafile')
+    parser.add_argument('--certfile')
+    parser.add_argument('--keyfile')
+    args = parser.parse_args()
+
+    decoder = SnapshotDecoder(Font5x8(FONT_FILE) if os.path.exists(FONT_FILE) else None)
+
+    if args.broker:
+        if not args.topic:
+            parser.error('--topic is needed with --broker')
+        mirror_live(decoder, args)
+    elif args.files:
+        decode_files(decoder, args.files, args.output)
+    else:
+        parser.error('give either snapshot files, or a --broker to subscribe to')
+
+
+if __name__ == '__main__':
+    main()
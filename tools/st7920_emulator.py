@@ -0,0 +1,232 @@
+"""
+`st7920_emulator`
+====================================================
+
+A host side emulation of the ST7920 LCD controller, decoding the
+serial byte stream sent by the driver into the graphics RAM and
+text RAM, and composing them into the image shown on the LCD.
+
+Also provides a fake SPI bus and pins, so the driver can be run on
+the MicroPython unix port, or any other machine without the `machine`
+module. Works with both MicroPython and CPython.
+
+* Author: Kevin O'Connell
+
+"""
+
+import sys
+
+
+WIDTH = 128
+HEIGHT = 64
+
+# the DDRAM address of the start of each row of the text grid
+TEXT_ROW_ADDRESS = (0x00, 0x10, 0x08, 0x18)
+TEXT_ROWS = 4
+TEXT_COLUMNS = 16
+
+
+class ST7920Emulator:
+    """Decode the serial stream sent to an ST7920 in 8-bit mode."""
+
+    def __init__(self):
+        # the GDRAM is 256 pixels wide and 32 rows high, with the bottom
+        # half of the display in the right half of the RAM.
+        self.gdram = bytearray(32 * 32)
+        self.ddram = bytearray(b' ' * 64)
+
+        self.extended = False
+        self.graphic = False
+
+        self._sync = None
+        self._nibble = None
+
+        self._target = None
+        self._vertical = 0
+        self._horizontal = 0
+        self._address_state = 0
+        self._ddram_address = 0
+        self._byte_in_word = 0
+
+        self.bytes_received = 0
+
+    def feed(self, data):
+        """Decode the bytes written over SPI."""
+
+        for byte in data:
+            self.bytes_received += 1
+            if (byte & 0xF8) == 0xF8:
+                # synchronising byte, bit 1 = RS, bit 2 = RW
+                self._sync = byte
+                self._nibble = None
+            elif self._sync is None:
+                raise ValueError('data received before a synchronising byte')
+            elif self._nibble is None:
+                self._nibble = byte & 0xF0
+            else:
+                value = self._nibble | (byte >> 4)
+                self._nibble = None
+                if self._sync & 0x02:
+                    self._data(value)
+                else:
+                    self._instruction(value)
+
+    def _instruction(self, value):
+        if (value & 0xE0) == 0x20:
+            # function set, G is only valid in the extended set
+            self.extended = bool(value & 0x04)
+            if self.extended:
+                self.graphic = bool(value & 0x02)
+
+        elif value & 0x80:
+            if self.extended:
+                # GDRAM address, vertical then horizontal
+                if self._address_state == 0:
+                    self._vertical = value & 0x3F
+                    self._address_state = 1
+                else:
+                    self._horizontal = value & 0x0F
+                    self._address_state = 0
+                    self._byte_in_word = 0
+                    self._target = 'gdram'
+            else:
+                self._ddram_address = value & 0x1F
+                self._byte_in_word = 0
+                self._target = 'ddram'
+
+        elif value == 0x01 and not self.extended:
+            # display clear fills the DDRAM with spaces
+            self.ddram[:] = b' ' * len(self.ddram)
+            self._ddram_address = 0
+
+    def _data(self, value):
+        if self._target == 'gdram':
+            offset = (self._vertical * 32) + (self._horizontal * 2) + self._byte_in_word
+            self.gdram[offset] = value
+            self._byte_in_word += 1
+            if self._byte_in_word == 2:
+                self._byte_in_word = 0
+                self._horizontal = (self._horizontal + 1) & 0x0F
+
+        elif self._target == 'ddram':
+            self.ddram[(self._ddram_address * 2) + self._byte_in_word] = value
+            self._byte_in_word += 1
+            if self._byte_in_word == 2:
+                self._byte_in_word = 0
+                self._ddram_address = (self._ddram_address + 1) & 0x1F
+
+    def graphics_frame(self):
+        """Return the GDRAM as a 128x64 MONO_HLSB frame."""
+
+        frame = bytearray(WIDTH * HEIGHT // 8)
+        for row in range(HEIGHT):
+            src = ((row & 0x1F) * 32) + (16 * (row >> 5))
+            frame[row * 16:(row + 1) * 16] = self.gdram[src:src + 16]
+        return frame
+
+    def text_row(self, row):
+        """Return the characters in the given row of the text grid."""
+
+        start = TEXT_ROW_ADDRESS[row] * 2
+        return bytes(self.ddram[start:start + TEXT_COLUMNS])
+
+    def composed_frame(self, font):
+        """Return the frame as shown on the LCD, the text combined with the
+        graphics by XOR. The character generator ROM isn't available, so
+        `font` is used to approximate it, drawing each character 1 pixel
+        from the left and 4 pixels from the top of its 8x16 cell."""
+
+        text = [self.text_row(row) for row in range(TEXT_ROWS)]
+        return compose_text(self.graphics_frame(), text, font)
+
+
+def compose_text(frame, text, font):
+    """Combine the rows of text with the MONO_HLSB frame by XOR, the way
+    the LCD does, approximating the character generator with `font`."""
+
+    for row, characters in enumerate(text):
+        for column, code in enumerate(characters):
+            if code == 0x20:
+                continue
+            glyph = font.glyph_rows(code)
+            for i, bits in enumerate(glyph):
+                offset = (((row * 16) + 4 + i) * 16) + column
+                frame[offset] ^= bits >> 1
+    return frame
+
+
+class Font5x8:
+    """The 5x8 font from the assets folder, used to approximate the
+    character generator ROM when composing the text."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.width, self.height = f.read(2)
+            self.columns = f.read()
+
+    def glyph_rows(self, code):
+        """Return the glyph as a list of row bytes, MSB on the left."""
+
+        rows = [0] * self.height
+        for x in range(self.width):
+            column = self.columns[(code * self.width) + x]
+            for y in range(self.height):
+                if (column >> y) & 1:
+                    rows[y] |= 0x80 >> x
+        return rows
+
+
+def write_pbm(path, frame, width=WIDTH, height=HEIGHT):
+    """Write a MONO_HLSB frame to a binary PBM file."""
+
+    with open(path, 'wb') as f:
+        f.write(('P4\n%d %d\n' % (width, height)).encode())
+        f.write(frame)
+
+
+class FakePin:
+    """A pin that just remembers its value."""
+
+    OUT = 1
+    IN = 0
+    PULL_DOWN = 2
+    PULL_UP = 3
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, *args, value=0, **kwargs):
+        self._value = value
+
+    def init(self, *args, **kwargs):
+        pass
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        self._value = value
+
+    def irq(self, *args, **kwargs):
+        pass
+
+
+class FakeSPI:
+    """An SPI bus feeding everything written to an emulated display."""
+
+    def __init__(self, *args, **kwargs):
+        self.emulator = ST7920Emulator()
+        self.writes = 0
+
+    def write(self, buffer):
+        self.writes += 1
+        self.emulator.feed(buffer)
+
+
+def install_fake_machine():
+    """Install a minimal `machine` module, so the display driver can be
+    imported on ports that don't have one."""
+
+    class machine:
+        Pin = FakePin
+        SPI = FakeSPI
+
+    sys.modules['machine'] = machine